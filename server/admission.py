@@ -0,0 +1,130 @@
+"""Per-endpoint admission control for expensive reads.
+
+``ADMISSION_LIMITS`` maps an endpoint (``"scientists"`` for the
+``Scientists`` resource, ``"export"`` for ``/export/<table>``) to the number
+of requests allowed to run its :func:`admitted` handler at once and the
+number allowed to queue for a slot. A request that finds the queue full, or
+that waited ``ADMISSION_TIMEOUT`` seconds without getting a slot, is refused
+at once with 503 and ``Retry-After`` instead of tying up a worker. Endpoints
+without a limit, such as ``/scientists/<id>``, are never held back, so point
+lookups keep their latency while list or export calls are saturated.
+
+:func:`admitted` goes beneath :func:`etags.conditional`, so 304s and
+responses served from the compressed cache never wait for a slot: they are
+the cheap requests that should keep flowing when the endpoint is busy.
+
+A slot is held until the request is torn down, which for a streamed export
+is after its last row has been sent. Per-endpoint activity, queue depth and
+shed counts are served as JSON on ``/admission/stats``.
+"""
+
+import math
+import threading
+from functools import wraps
+
+from flask import current_app, g, request
+
+
+class Overloaded(Exception):
+    """No slot became free for the request in time."""
+
+
+class Limiter:
+    """A counting semaphore with a bounded, timed wait queue."""
+
+    def __init__(self, concurrency, queue=0, timeout=1.0):
+        self.concurrency = concurrency
+        self.queue = queue
+        self.timeout = timeout
+        self.active = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.shed = 0
+        self._slots = threading.Condition()
+
+    def acquire(self):
+        """Take a slot, waiting in the queue if there is room.
+
+        Raises :class:`Overloaded` if the queue is full or the wait times out.
+        """
+        with self._slots:
+            if self.active >= self.concurrency:
+                if self.waiting >= self.queue:
+                    self.shed += 1
+                    raise Overloaded()
+                self.waiting += 1
+                try:
+                    free = self._slots.wait_for(
+                        lambda: self.active < self.concurrency, self.timeout
+                    )
+                finally:
+                    self.waiting -= 1
+                if not free:
+                    self.shed += 1
+                    raise Overloaded()
+            self.active += 1
+            self.admitted += 1
+
+    def release(self):
+        with self._slots:
+            self.active -= 1
+            self._slots.notify()
+
+    def stats(self):
+        return {
+            "concurrency": self.concurrency,
+            "queue": self.queue,
+            "active": self.active,
+            "waiting": self.waiting,
+            "admitted": self.admitted,
+            "shed": self.shed,
+        }
+
+
+def _limiters():
+    return current_app.extensions["admission"]
+
+
+def admitted(view):
+    """Run ``view`` only with a slot of its endpoint's limiter, if it has one."""
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        limiter = _limiters().get(request.endpoint)
+        if limiter is None:
+            return view(*args, **kwargs)
+        try:
+            limiter.acquire()
+        except Overloaded:
+            return (
+                {"error": "503: Server busy"},
+                503,
+                {"Retry-After": str(math.ceil(limiter.timeout))},
+            )
+        g.admission = limiter
+        return view(*args, **kwargs)
+
+    return wrapper
+
+
+def _teardown_request(exc):
+    limiter = g.pop("admission", None)
+    if limiter is not None:
+        limiter.release()
+
+
+def admission_stats():
+    return {
+        endpoint: limiter.stats() for endpoint, limiter in _limiters().items()
+    }
+
+
+def init_admission(app):
+    """Limit ``app``'s endpoints listed in ``ADMISSION_LIMITS``."""
+    timeout = app.config["ADMISSION_TIMEOUT"]
+    app.extensions["admission"] = {
+        endpoint: Limiter(limit["concurrency"], limit.get("queue", 0), timeout)
+        for endpoint, limit in app.config["ADMISSION_LIMITS"].items()
+    }
+    app.teardown_request(_teardown_request)
+    app.add_url_rule("/admission/stats", "admission_stats", admission_stats)
@@ -1,99 +1,670 @@
 #!/usr/bin/env python3
 
-from flask import Flask, make_response, jsonify, request
-from flask_migrate import Migrate
+import json
+import math
+import re
+
+from flask import (
+    Flask,
+    Response,
+    current_app,
+    make_response,
+    jsonify,
+    request,
+    stream_with_context,
+)
 from flask_restful import Api, Resource
 from flask_cors import CORS
-from models import db, Planet, Scientist, Mission
+from sqlalchemy import delete, insert, select, tuple_, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import load_only, selectinload
+from werkzeug.exceptions import BadRequest
+from werkzeug.routing import IntegerConverter
+from admission import admitted, init_admission
+from cache import (
+    MISSING,
+    cache_stats,
+    init_cache,
+    invalidate_on_commit,
+    planet_cache,
+    scientist_cache,
+)
+from compression import init_compression
+from config import get_config
+from etags import bump, conditional
+from metrics import init_metrics
+from profiling import init_profiler
+from replica import init_replica, reading_replica, replica_reads
+from schemas import (
+    INT64_MAX,
+    INT64_MIN,
+    ValidationError,
+    mission_schema,
+    scientist_schema,
+)
+from models import db, init_db, scientists_fts, Planet, Scientist, Mission
+from serializers import (
+    planet_counts_serializer,
+    planet_serializer,
+    scientist_serializer,
+    mission_serializer,
+)
+from writebehind import QueueTimeout, init_write_behind
+
+MAX_PAGE_SIZE = 1000
+EXPORT_CHUNK_SIZE = 1000
+# Ids per DELETE /scientists?ids=; each is a bound variable of an IN list,
+# and SQLite before 3.32 allows 999 of them per statement.
+MAX_DELETE_IDS = 500
+EXPORTS = {
+    "planets": planet_serializer,
+    "scientists": scientist_serializer,
+    "missions": mission_serializer,
+}
+INCLUDES = ("missions", "planets")
+
+
+def id_cursor(raw):
+    id = int(raw)
+    if id < 0 or id > INT64_MAX:
+        raise ValueError("Invalid cursor")
+    return id
+
+
+class IdConverter(IntegerConverter):
+    """``<int:...>`` bounded to the ids SQLite can store.
+
+    Larger ids get a 400 rather than overflowing in the query. It replaces
+    the stock ``int`` converter so rules, and the metric labels taken from
+    them, keep reading ``<int:id>``.
+    """
+
+    def to_python(self, value):
+        try:
+            return id_cursor(value)
+        except ValueError:
+            raise BadRequest(
+                response=make_response({"error": "400: Validation error"}, 400)
+            )
+
+
+def page_args(cursor=id_cursor):
+    """Read ``?limit=&after=`` from the query string.
+
+    ``after`` is parsed with ``cursor`` and is ``None`` on the first page.
+    Returns ``(None, None)`` when no ``limit`` is given so callers can keep
+    serving the unpaginated list. Raises ``ValueError`` on bad input.
+    """
+    limit = request.args.get("limit")
+    after = request.args.get("after")
+    if limit is None:
+        return None, None
+    limit = int(limit)
+    if limit < 1 or limit > MAX_PAGE_SIZE:
+        raise ValueError("Invalid page")
+    return limit, cursor(after) if after else None
+
+
+def keyset_select(stmt, key, limit, after, order_by=None):
+    """Restrict ``stmt`` to the page of rows whose ``key`` follows ``after``.
+
+    ``key`` may be a ``tuple_()`` of columns, in which case ``order_by``
+    lists those columns. One extra row is read to find out whether another
+    page exists, so every page is a single index range scan no matter how
+    deep the cursor is.
+    """
+    if after is not None:
+        stmt = stmt.where(key > after)
+    return stmt.order_by(*(order_by or (key,))).limit(limit + 1)
+
+
+def split_page(rows, limit, cursor=lambda row: row.id):
+    """Trim the look-ahead row from a :func:`keyset_select` result."""
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, cursor(rows[-1])
+    return rows, None
+
+
+def include_args(default=()):
+    """Read ``?include=missions,planets`` from the query string.
+
+    ``planets`` embeds each mission's planet and so implies ``missions``.
+    Raises ``ValueError`` on unknown names.
+    """
+    raw = request.args.get("include")
+    if raw is None:
+        return set(default)
+    include = {name.strip() for name in raw.split(",") if name.strip()}
+    if include - set(INCLUDES):
+        raise ValueError("Invalid include")
+    if "planets" in include:
+        include.add("missions")
+    return include
+
+
+def fields_args(serializer):
+    """Narrow ``serializer`` to ``?fields=id,name`` from the query string.
+
+    Unrequested columns are left out of the SELECT as well as the output.
+    Raises ``ValueError`` on fields ``serializer`` does not have.
+    """
+    raw = request.args.get("fields")
+    if raw is None:
+        return serializer
+    fields = {name.strip() for name in raw.split(",") if name.strip()}
+    if not fields:
+        raise ValueError("Invalid fields")
+    return serializer.only(fields)
+
+
+def validation_error(errors):
+    return ({"error": "400: Validation error", "errors": errors}, 400)
+
+
+def search_args():
+    """Read ``?q=`` as an FTS5 query matching every word as a prefix.
 
-app = Flask(__name__)
-app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///app.db"
-app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
-app.json.compact = False
+    Each word is quoted so user input can never be read as FTS5 syntax.
+    Returns ``None`` without ``q``. Raises ``ValueError`` if it has no words.
+    """
+    raw = request.args.get("q")
+    if raw is None:
+        return None
+    words = re.findall(r"\w+", raw)
+    if not words:
+        raise ValueError("Invalid search")
+    return " ".join(f'"{word}"*' for word in words)
 
-migrate = Migrate(app, db)
-CORS(app)
-api = Api(app)
-db.init_app(app)
+
+def rank_cursor(raw):
+    """Parse the ``<rank>:<id>`` cursor of search result pages."""
+    rank, id = raw.rsplit(":", 1)
+    rank = float(rank)
+    if not math.isfinite(rank):
+        raise ValueError("Invalid cursor")
+    return rank, id_cursor(id)
+
+
+def scientist_loader(include):
+    """Eager-load options so ``include`` costs one extra query per level."""
+    if "missions" not in include:
+        return []
+    missions = selectinload(Scientist.scientist_missions)
+    if "planets" in include:
+        missions = missions.selectinload(Mission.planet)
+    return [missions]
+
+
+def scientist_dict(scientist, include, serializer=scientist_serializer):
+    data = serializer.obj(scientist)
+    if "missions" in include:
+        missions = []
+        for mission in scientist.scientist_missions:
+            mission_data = mission_serializer.obj(mission)
+            if "planets" in include:
+                mission_data["planet"] = planet_serializer.obj(mission.planet)
+            missions.append(mission_data)
+        data["missions"] = missions
+    return data
+
+
+def scientist_tables():
+    """Tables read by a scientist GET, for its ETag.
+
+    Detail responses (routed with an ``id``) and ``?include=`` lists embed
+    missions and planets, so writes to those tables invalidate them too.
+    """
+    if request.args.get("include") or request.view_args:
+        return ("scientists", "missions", "planets")
+    return ("scientists",)
+
+
+def delete_scientists(ids):
+    """Delete scientists and their missions with two set-based statements.
+
+    Both run in one transaction. Returns the number of scientists removed.
+    """
+    db.session.execute(delete(Mission).where(Mission.scientist_id.in_(ids)))
+    result = db.session.execute(delete(Scientist).where(Scientist.id.in_(ids)))
+    db.session.commit()
+    bump("scientists", "missions")
+    return result.rowcount
 
 
-@app.route('/')
 def home():
     return ''
 
+def cache_stats_view():
+    return cache_stats()
+
+def export(table):
+    """Stream every row of ``table`` as newline-delimited JSON.
+
+    Rows are fetched ``EXPORT_CHUNK_SIZE`` at a time and written out as they
+    arrive, so memory use does not grow with the size of the table.
+    """
+    serializer = EXPORTS.get(table)
+    if serializer is None:
+        return make_response({"error": "404: Table not found"}, 404)
+    try:
+        serializer = fields_args(serializer)
+    except ValueError:
+        return make_response({"error": "400: Validation error"}, 400)
+    stmt = (
+        serializer.select()
+        .order_by(serializer.model.id)
+        .execution_options(yield_per=EXPORT_CHUNK_SIZE)
+    )
+    separators = (",", ":") if current_app.config["JSON_COMPACT"] else None
+
+    def generate():
+        for chunk in db.session.execute(stmt).partitions():
+            yield "".join(
+                json.dumps(serializer.row(row), separators=separators) + "\n"
+                for row in chunk
+            )
+
+    return Response(
+        stream_with_context(generate()), mimetype="application/x-ndjson"
+    )
+
 class Scientists(Resource):
+    @replica_reads
+    @conditional(scientist_tables)
+    @admitted
     def get(self):
-        scientists = [s.to_dict() for s in Scientist.query.all()]
-        return scientists, 200
+        try:
+            search = search_args()
+            limit, after = page_args(rank_cursor if search else id_cursor)
+            include = include_args()
+            serializer = fields_args(scientist_serializer)
+        except ValueError:
+            return ({"error": "400: Validation error"}, 400)
+        if include:
+            stmt = select(Scientist).options(
+                load_only(*serializer.columns), *scientist_loader(include)
+            )
+        else:
+            stmt = serializer.select()
+
+        row_id = (lambda row: row.Scientist.id) if include else (lambda row: row.id)
+        if search:
+            # Matches are ranked and paged inside the full-text index, and
+            # only the page is joined back to scientists. bm25 ranks are
+            # negative; lower is better.
+            fts = scientists_fts.c
+            ranked = select(fts.rowid.label("id"), fts.rank).where(
+                fts.scientists_fts.match(search)
+            )
+            if limit is not None:
+                ranked = keyset_select(
+                    ranked, tuple_(fts.rank, fts.rowid), limit,
+                    tuple_(*after) if after else None, (fts.rank, fts.rowid),
+                )
+            ranked = ranked.subquery()
+            stmt = (
+                stmt.add_columns(ranked.c.rank)
+                .join(ranked, ranked.c.id == Scientist.id)
+                .order_by(ranked.c.rank, Scientist.id)
+            )
+            cursor = lambda row: f"{row.rank!r}:{row_id(row)}"
+        else:
+            cursor = row_id
+            if limit is None:
+                stmt = stmt.order_by(Scientist.id)
+            else:
+                stmt = keyset_select(stmt, Scientist.id, limit, after)
+
+        rows = db.session.execute(stmt).all()
+        if limit is not None:
+            rows, next_cursor = split_page(rows, limit, cursor)
+
+        if include:
+            scientists = [
+                scientist_dict(row.Scientist, include, serializer) for row in rows
+            ]
+        else:
+            # The serializer's keys stop short of a trailing rank column.
+            scientists = serializer.rows(rows)
+        if limit is None:
+            return scientists, 200
+        return {"scientists": scientists, "next": next_cursor}, 200
     
     def post(self):
-        data = request.get_json()
         try:
-            new_scientist = Scientist(
-                name = data.get("name"),
-                field_of_study = data.get("field_of_study"),
-                avatar = data.get("avatar"),
-            )
-            db.session.add(new_scientist)
+            values = scientist_schema.validate(request.get_json(silent=True))
+        except ValidationError as error:
+            return validation_error(error.errors)
+        errors = scientist_schema.taken(values)
+        if errors:
+            return validation_error(errors)
+
+        new_scientist = Scientist(**values)
+        db.session.add(new_scientist)
+        try:
             db.session.commit()
-            return new_scientist.to_dict(), 201
-        except Exception:
+        except IntegrityError:
+            # Lost a race with another insert of the same name.
+            db.session.rollback()
+            return validation_error(["Duplicate name"])
+        bump("scientists")
+        return scientist_serializer.obj(new_scientist), 201
+
+    def delete(self):
+        try:
+            raw = request.args["ids"].split(",")
+            if len(raw) > MAX_DELETE_IDS:
+                raise ValueError("Too many ids")
+            ids = [id_cursor(id) for id in raw]
+        except (KeyError, ValueError):
             return ({"error": "400: Validation error"}, 400)
+        return {"deleted": delete_scientists(ids)}, 200
+
+
+def scientist_changes(data):
+    """Split a PATCH body into validated column values and the expected version.
+
+    ``version``, when given, must be the version the client last read; the
+    other keys are checked by ``scientist_schema``. Raises ``ValidationError``
+    on bad input.
+    """
+    if not isinstance(data, dict) or not data:
+        raise ValidationError(["Invalid scientist"])
+    data = dict(data)
+    expected = data.pop("version", None)
+    if expected is not None and (
+        type(expected) is not int or not 1 <= expected <= INT64_MAX
+    ):
+        raise ValidationError(["Invalid version"])
+    if not data:
+        raise ValidationError(["Invalid scientist"])
+    return scientist_schema.validate(data, partial=True), expected
 
-api.add_resource(Scientists, "/scientists")
 
 class ScientistById(Resource):
+    @replica_reads
+    @conditional(scientist_tables)
     def get(self, id):
         try:
-            scientist = Scientist.query.filter(Scientist.id == id).first()
-            return scientist.to_dict(), 200
-        except Exception:
+            include = include_args(default=INCLUDES)
+        except ValueError:
             return ({"error": "400: Validation error"}, 400)
+        cacheable = request.args.get("include") is None
+        if cacheable:
+            data = scientist_cache.get(id)
+            if data is not MISSING:
+                return data, 200
+            generation = scientist_cache.generation()
 
-    def patch(self, id):
-        data = request.get_json()
-        scientist = Scientist.query.filter(Scientist.id == id).first()
+        scientist = (
+            Scientist.query.options(*scientist_loader(include))
+            .filter(Scientist.id == id)
+            .first()
+        )
         if not scientist:
-            return ({"error": "404 not found"}, 404)
-        for attr in data:
-            setattr(scientist, attr, data.get(attr))
+            return ({"error": "404: Scientist not found"}, 404)
+        data = scientist_dict(scientist, include)
+        # A replica read may predate the last invalidation of this entry.
+        if cacheable and not reading_replica():
+            scientist_cache.set(id, data, generation)
+        return data, 200
 
-        db.session.add(scientist)
+    def patch(self, id):
+        """Apply the body in one ``UPDATE ... RETURNING`` without loading the row.
+
+        The update only matches while ``version`` is still the one the client
+        sent, so a concurrent edit is reported as a 409 instead of being
+        overwritten.
+        """
+        try:
+            changes, expected = scientist_changes(request.get_json(silent=True))
+        except ValidationError as error:
+            return validation_error(error.errors)
+
+        scientists = Scientist.__table__
+        stmt = (
+            update(scientists)
+            .where(scientists.c.id == id)
+            .values(**changes, version=scientists.c.version + 1)
+            .returning(*(scientists.c[key] for key in scientist_serializer.keys))
+        )
+        if expected is not None:
+            stmt = stmt.where(scientists.c.version == expected)
+        try:
+            row = db.session.execute(stmt).first()
+        except IntegrityError:
+            db.session.rollback()
+            return validation_error(["Duplicate name"])
+        if row is None:
+            db.session.rollback()
+            if db.session.get(Scientist, id) is None:
+                return ({"error": "404: Scientist not found"}, 404)
+            return ({"error": "409: Scientist was changed by another request"}, 409)
+
+        invalidate_on_commit(db.session, scientist_cache, id)
         db.session.commit()
-        return scientist.to_dict(), 202
-    
+        bump("scientists")
+        return scientist_serializer.row(row), 202
+
     def delete(self, id):
-        scientist = Scientist.query.filter_by(id = id).first()
-        missions = Mission.query.filter_by(id = id).all()
-        if not scientist:
-            return ({"error": "404 not found"}, 404)
-        if missions:
-            for m in missions:
-                db.session.query(Mission).filter(Mission.id == m.id).delete()
-                db.session.commit()
-        db.session.delete(scientist)
-        db.session.commit()
+        if not delete_scientists([id]):
+            return ({"error": "404: Scientist not found"}, 404)
         return ({}, 204)
 
-api.add_resource(ScientistById, "/scientists/<int:id>")
 
 class Missions(Resource):
     def post(self):
-        data = request.get_json()
+        data = request.get_json(silent=True)
+        if isinstance(data, list):
+            return self.post_many(data)
+        try:
+            values = mission_schema.validate(data)
+        except ValidationError as error:
+            return validation_error(error.errors)
+
+        writer = current_app.extensions.get("mission_writer")
+        if writer is not None:
+            try:
+                return writer.submit(values), 201
+            except ValidationError as error:
+                return validation_error(error.errors)
+            except QueueTimeout:
+                return (
+                    {"error": "503: Write queue timed out"},
+                    503,
+                    {"Retry-After": str(math.ceil(writer.timeout))},
+                )
+
+        new_mission = Mission(**values)
+        db.session.add(new_mission)
         try:
-            new_mission = Mission(
-                name = data.get('name'),
-                scientist_id = data.get('scientist_id'),
-                planet_id = data.get('planet_id'),
-            )
-            db.session.add(new_mission)
             db.session.commit()
-            return new_mission.to_dict(), 201
-        except:
-            return "Could not post mission", 400
+        except IntegrityError:
+            db.session.rollback()
+            return validation_error(["Invalid mission"])
+        bump("missions")
+        return mission_serializer.obj(new_mission), 201
+
+    def post_many(self, items):
+        """Insert a list of missions in one executemany and one commit.
+
+        Each item gets either its new ``id`` or its validation ``errors``;
+        invalid items are skipped without failing the rest of the batch.
+        """
+        results = [None] * len(items)
+        rows = []
+        positions = []
+        for position, item in enumerate(items):
+            try:
+                rows.append(mission_schema.validate(item))
+                positions.append(position)
+            except ValidationError as error:
+                results[position] = {"errors": error.errors}
+
+        if rows:
+            stmt = insert(Mission).returning(
+                Mission.id, sort_by_parameter_order=True
+            )
+            try:
+                ids = db.session.scalars(stmt, rows).all()
+                db.session.commit()
+            except IntegrityError:
+                db.session.rollback()
+                return ({"error": "400: Validation error"}, 400)
+            bump("missions")
+            for position, id in zip(positions, ids):
+                results[position] = {"id": id}
+        return results, 201
+
+
+
+def int64(raw):
+    """``int(raw)``, raising ``ValueError`` outside SQLite's 64-bit range."""
+    value = int(raw)
+    if not INT64_MIN <= value <= INT64_MAX:
+        raise ValueError("Integer out of range")
+    return value
+
+
+def int_arg(name):
+    raw = request.args.get(name)
+    return None if raw is None else int64(raw)
+
+
+def distance_cursor(raw):
+    """Parse the ``<distance>:<id>`` cursor of distance-sorted pages."""
+    distance, id = raw.split(":")
+    return int64(distance), id_cursor(id)
+
+
+class Planets(Resource):
+    @admitted
+    def get(self):
+        sort = request.args.get("sort", "id")
+        try:
+            if sort not in ("id", "distance"):
+                raise ValueError("Invalid sort")
+            limit, after = page_args(
+                distance_cursor if sort == "distance" else id_cursor
+            )
+            min_distance = int_arg("min_distance")
+            max_distance = int_arg("max_distance")
+            serializer = fields_args(planet_counts_serializer)
+        except ValueError:
+            return ({"error": "400: Validation error"}, 400)
+
+        distance = Planet.distance_from_earth
+        stmt = serializer.select()
+        if min_distance is not None:
+            stmt = stmt.where(distance >= min_distance)
+        if max_distance is not None:
+            stmt = stmt.where(distance <= max_distance)
+        if sort == "distance":
+            # Planets without a distance cannot be placed on this order.
+            stmt = stmt.where(distance.isnot(None))
+            if "distance_from_earth" not in serializer.keys:
+                # Read for the cursor only; rows() stops short of it.
+                stmt = stmt.add_columns(distance)
+            key, order_by = tuple_(distance, Planet.id), (distance, Planet.id)
+            after = tuple_(*after) if after else None
+            cursor = lambda row: f"{row.distance_from_earth}:{row.id}"
+        else:
+            key, order_by = Planet.id, (Planet.id,)
+            cursor = lambda row: row.id
+
+        if limit is None:
+            rows = db.session.execute(stmt.order_by(*order_by)).all()
+            return serializer.rows(rows), 200
+
+        rows, next_cursor = split_page(
+            db.session.execute(
+                keyset_select(stmt, key, limit, after, order_by)
+            ).all(),
+            limit,
+            cursor,
+        )
+        return {
+            "planets": serializer.rows(rows),
+            "next": next_cursor,
+        }, 200
+
+
+class PlanetById(Resource):
+    def get(self, id):
+        data = planet_cache.get(id)
+        if data is not MISSING:
+            return data, 200
+        generation = planet_cache.generation()
+        row = db.session.execute(
+            planet_counts_serializer.select().where(Planet.id == id)
+        ).first()
+        if row is None:
+            return ({"error": "404: Planet not found"}, 404)
+        data = planet_counts_serializer.row(row)
+        planet_cache.set(id, data, generation)
+        return data, 200
+
+
+
+def create_app(config=None):
+    """Build the app for ``config``: a config class, a profile name, or
+    ``None`` for ``$APP_CONFIG``.
+    """
+    app = Flask(__name__)
+    if config is None or isinstance(config, str):
+        config = get_config(config)
+    app.config.from_object(config)
+    app.url_map.converters["int"] = IdConverter
+    app.json.compact = app.config["JSON_COMPACT"]
+    if app.config["JSON_COMPACT"]:
+        # Flask-RESTful serializes resources itself and indents in debug.
+        app.config["RESTFUL_JSON"] = {
+            "separators": (",", ":"),
+            "indent": None,
+            **app.config.get("RESTFUL_JSON", {}),
+        }
+
+    CORS(app)
+    init_db(app)
+    init_cache(app)
+    init_metrics(app)
+    init_profiler(app)
+    init_admission(app)
+    init_replica(app)
+    init_write_behind(app)
+    init_compression(app)
+    # Alembic takes longer to import than the rest of the app put together,
+    # so it is only loaded when MIGRATE asks for the ``flask db`` commands.
+    if app.config["MIGRATE"]:
+        from flask_migrate import Migrate
+        Migrate(app, db)
+
+    app.add_url_rule("/", "home", home)
+    app.add_url_rule("/cache/stats", "cache_stats_view", cache_stats_view)
+    app.add_url_rule("/export/<table>", "export", admitted(export))
+    api = Api(app)
+    api.add_resource(Scientists, "/scientists")
+    api.add_resource(ScientistById, "/scientists/<int:id>")
+    api.add_resource(Missions, "/missions")
+    api.add_resource(Planets, "/planets")
+    api.add_resource(PlanetById, "/planets/<int:id>")
+    return app
+
+
+_app = None
+
 
-api.add_resource(Missions, "/missions")
+def __getattr__(name):
+    # ``from app import app`` (scripts, tests, ``flask`` CLI discovery) gets a
+    # default app built on first use; servers should call create_app().
+    global _app
+    if name != "app":
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    if _app is None:
+        _app = create_app()
+    return _app
 
 
 if __name__ == '__main__':
-    app.run(port=5555, debug=True)
\ No newline at end of file
+    create_app().run(port=5555, debug=True)
\ No newline at end of file
@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+"""Benchmark every route at several database sizes.
+
+    python benchmarks/bench.py --out results.json
+    python benchmarks/bench.py --scales 1k --baseline results.json --threshold 1.25
+    python benchmarks/bench.py --scales 1k --config production
+
+Each scale is seeded once into a scratch SQLite file with ``seed.seed_db``.
+Every (scale, route) pair then runs in its own spawned process against a
+fresh copy of that file, so writes from one route never leak into another
+and the reported peak RSS belongs to that route alone. Requests go through
+``app.test_client()``, so the numbers cover Flask, Flask-RESTful,
+SQLAlchemy and serialization but not a real HTTP server.
+
+With ``--baseline`` the run exits non-zero when any route's p50 latency is
+more than ``--threshold`` times the baseline's. It also exits non-zero when
+any route had error responses, since their latency is not the route's.
+
+Requests send ``Accept-Encoding: br, gzip``; ``--config production`` turns on
+compact JSON and compression, so comparing its ``bytes_per_request`` and
+``cpu_ms_per_request`` with the default development config shows what
+compression saves on the wire and what it costs in CPU.
+"""
+
+import argparse
+import contextlib
+import json
+import multiprocessing
+import os
+import platform
+import random
+import resource
+import shutil
+import sys
+import tempfile
+import time
+
+SERVER = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Scale name -> mission rows. Scientists and planets are derived from it.
+SCALES = {"1k": 1_000, "100k": 100_000, "1m": 1_000_000}
+
+
+def scale_counts(missions):
+    return {
+        "planets": max(10, missions // 100),
+        "scientists": max(100, missions // 10),
+        "missions": missions,
+    }
+
+
+# Route name -> function(rng, i, counts) returning (method, path, json).
+ROUTES = {
+    "list": lambda rng, i, c: ("get", "/scientists", None),
+    "list_page": lambda rng, i, c: (
+        "get",
+        f"/scientists?limit=100&after={rng.randint(0, c['scientists'])}",
+        None,
+    ),
+    "detail": lambda rng, i, c: (
+        "get", f"/scientists/{rng.randint(1, c['scientists'])}", None,
+    ),
+    "create": lambda rng, i, c: (
+        "post",
+        "/scientists",
+        {"name": f"Bench Scientist {i}", "field_of_study": "benchmarking"},
+    ),
+    "patch": lambda rng, i, c: (
+        "patch",
+        f"/scientists/{rng.randint(1, c['scientists'])}",
+        {"field_of_study": f"benchmarking {i}"},
+    ),
+    # Each request deletes its own scientist, inserted by SETUP.
+    "delete": lambda rng, i, c: (
+        "delete", f"/scientists/{c['first_victim'] + i}", None,
+    ),
+    "mission_post": lambda rng, i, c: (
+        "post",
+        "/missions",
+        {
+            "name": f"Bench mission {i}",
+            "scientist_id": rng.randint(1, c["scientists"]),
+            "planet_id": rng.randint(1, c["planets"]),
+        },
+    ),
+}
+
+
+HEADERS = {"Accept-Encoding": "br, gzip"}
+
+
+def add_victims(n):
+    """Insert ``n`` scientists for "delete" to remove; return the first id."""
+    from sqlalchemy import insert
+    from models import db, Scientist
+
+    ids = db.session.scalars(
+        insert(Scientist).returning(Scientist.id, sort_by_parameter_order=True),
+        [{"name": f"Bench victim {i}", "field_of_study": "deletion"}
+         for i in range(n)],
+    ).all()
+    db.session.commit()
+    return {"first_victim": ids[0]}
+
+
+# Route name -> function(number of requests) run before timing starts,
+# returning extra values for the route's request function.
+SETUP = {"delete": add_victims}
+
+
+def import_app(db_path, config=None):
+    os.environ["DB_URI"] = f"sqlite:///{db_path}"
+    if SERVER not in sys.path:
+        sys.path.insert(0, SERVER)
+    from app import create_app
+    return create_app(config)
+
+
+def seed_scale(db_path, missions, queue):
+    app = import_app(db_path, "development")
+    from models import db
+    from seed import seed_db
+
+    # Keep seeding progress off stdout, which may carry the JSON report.
+    with app.app_context(), contextlib.redirect_stdout(sys.stderr):
+        db.create_all()
+        seed_db(chunk_size=50_000, **scale_counts(missions))
+    queue.put(None)
+
+
+def run_route(db_path, route, missions, requests, warmup, config, queue):
+    app = import_app(db_path, config)
+    counts = scale_counts(missions)
+    make_request = ROUTES[route]
+    rng = random.Random(0)
+    client = app.test_client()
+    latencies = []
+    errors = 0
+    sent = 0
+    cpu = 0.0
+
+    with app.app_context():
+        if route in SETUP:
+            counts.update(SETUP[route](warmup + requests))
+        for i in range(warmup + requests):
+            method, path, body = make_request(rng, i, counts)
+            start, start_cpu = time.perf_counter(), time.process_time()
+            response = getattr(client, method)(path, json=body, headers=HEADERS)
+            # Streamed bodies are produced while they are read.
+            size = len(response.get_data())
+            elapsed = time.perf_counter() - start
+            if i >= warmup:
+                latencies.append(elapsed)
+                cpu += time.process_time() - start_cpu
+                sent += size
+                errors += response.status_code >= 400
+
+    latencies.sort()
+    total = sum(latencies)
+    queue.put(
+        {
+            "requests": len(latencies),
+            "errors": errors,
+            "throughput_rps": round(len(latencies) / total, 1),
+            "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+            "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+            "bytes_per_request": round(sent / len(latencies)),
+            "cpu_ms_per_request": round(cpu / len(latencies) * 1000, 3),
+            # ru_maxrss is KiB on Linux.
+            "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        }
+    )
+
+
+def percentile(sorted_values, pct):
+    index = round(pct / 100 * (len(sorted_values) - 1))
+    return sorted_values[index]
+
+
+def in_process(ctx, target, *args):
+    queue = ctx.Queue()
+    process = ctx.Process(target=target, args=(*args, queue))
+    process.start()
+    process.join()
+    if process.exitcode:
+        raise RuntimeError(f"{target.__name__}{args} exited {process.exitcode}")
+    return queue.get()
+
+
+def run(scales, routes, requests, warmup, workdir, config):
+    ctx = multiprocessing.get_context("spawn")
+    results = {}
+    for scale in scales:
+        missions = SCALES[scale]
+        seeded = os.path.join(workdir, f"seed-{scale}.db")
+        if not os.path.exists(seeded):
+            print(f"seeding {scale}...", file=sys.stderr)
+            in_process(ctx, seed_scale, seeded, missions)
+
+        results[scale] = {}
+        for route in routes:
+            db_path = os.path.join(workdir, f"run-{scale}-{route}.db")
+            shutil.copyfile(seeded, db_path)
+            try:
+                results[scale][route] = in_process(
+                    ctx, run_route, db_path, route, missions, requests, warmup,
+                    config,
+                )
+            finally:
+                os.remove(db_path)
+            print(f"{scale:>5} {route:<13} {results[scale][route]}",
+                  file=sys.stderr)
+    return results
+
+
+def failures(results):
+    """List routes that got error responses."""
+    return [
+        f"{scale} {route}: {stats['errors']}/{stats['requests']} errors"
+        for scale, routes in results.items()
+        for route, stats in routes.items()
+        if stats["errors"]
+    ]
+
+
+def compare(results, baseline, threshold):
+    """List routes whose p50 grew by more than ``threshold`` times."""
+    regressions = []
+    for scale, routes in results.items():
+        for route, stats in routes.items():
+            before = baseline.get(scale, {}).get(route)
+            if before and stats["p50_ms"] > before["p50_ms"] * threshold:
+                regressions.append(
+                    f"{scale} {route}: p50 {before['p50_ms']}ms -> "
+                    f"{stats['p50_ms']}ms"
+                )
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scales", nargs="+", choices=SCALES,
+                        default=list(SCALES))
+    parser.add_argument("--routes", nargs="+", choices=ROUTES,
+                        default=list(ROUTES))
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--config", choices=("development", "production"),
+                        default="development",
+                        help="app config to benchmark (default: %(default)s)")
+    parser.add_argument("--workdir",
+                        help="keep seeded databases here between runs")
+    parser.add_argument("--out", help="write results JSON to this file")
+    parser.add_argument("--baseline", help="results JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=1.2)
+    args = parser.parse_args(argv)
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="cosmic-bench-")
+    os.makedirs(workdir, exist_ok=True)
+    try:
+        results = run(
+            args.scales, args.routes, args.requests, args.warmup, workdir,
+            args.config,
+        )
+    finally:
+        if not args.workdir:
+            shutil.rmtree(workdir)
+
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "requests": args.requests,
+            "warmup": args.warmup,
+            "config": args.config,
+        },
+        "results": results,
+    }
+    output = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+    status = 0
+    for failure in failures(results):
+        print(f"ERRORS {failure}", file=sys.stderr)
+        status = 1
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        status = 1 if regressions else status
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
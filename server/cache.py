@@ -0,0 +1,198 @@
+"""Bounded in-process LRU caches for serialized scientists and planets,
+and for compressed response bodies.
+
+Entries are dropped when the rows behind them change. Mapper events catch
+ORM flushes of single objects; ``do_orm_execute`` catches bulk
+``insert()``/``update()``/``delete()`` statements, which bypass mapper events,
+by clearing the whole cache. Invalidations are queued on the session and only
+applied once the transaction commits. A reader that queried before that
+commit passes the :meth:`LRUCache.generation` it saw before querying to
+``set()``, which discards its value if anything was invalidated since, so
+data read just before a write cannot be cached after it.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from models import Planet, Scientist, Mission
+
+MISSING = object()
+ALL = object()
+
+
+class LRUCache:
+    """A thread-safe LRU mapping with a per-entry time to live."""
+
+    def __init__(self, maxsize=1024, ttl=60.0, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._generation = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return the cached value for ``key`` or ``MISSING``."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                expires, value = entry
+                if expires > self.clock():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return MISSING
+
+    def generation(self):
+        """A token that changes whenever an entry is invalidated."""
+        return self._generation
+
+    def set(self, key, value, generation=None):
+        """Cache ``value`` under ``key``.
+
+        With ``generation``, taken before reading ``value``, the value is
+        dropped if any entry has been invalidated since.
+        """
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return
+            self._data[key] = (self.clock() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key):
+        with self._lock:
+            self._generation += 1
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._data.clear()
+
+    def stats(self):
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+scientist_cache = LRUCache()
+planet_cache = LRUCache()
+# (path and query, ETag, Content-Encoding) -> (mimetype, body); see
+# compression.py. An ETag changes whenever the data behind it does, so
+# entries never need invalidating and only age out.
+compressed_cache = LRUCache()
+
+
+def init_cache(app):
+    """Size the caches from ``CACHE_SIZE``, ``CACHE_TTL`` and
+    ``COMPRESS_CACHE_SIZE`` in ``app.config``.
+    """
+    for cache in (scientist_cache, planet_cache, compressed_cache):
+        cache.maxsize = app.config.get("CACHE_SIZE", cache.maxsize)
+        cache.ttl = app.config.get("CACHE_TTL", cache.ttl)
+        cache.clear()
+    compressed_cache.maxsize = app.config.get(
+        "COMPRESS_CACHE_SIZE", compressed_cache.maxsize
+    )
+
+
+def cache_stats():
+    return {
+        "scientists": scientist_cache.stats(),
+        "planets": planet_cache.stats(),
+        "compressed": compressed_cache.stats(),
+    }
+
+
+def invalidate_on_commit(session, cache, key):
+    """Drop ``key`` from ``cache`` once ``session`` commits.
+
+    For writes made through Core statements, which neither mapper events
+    nor the bulk statement hook can see.
+    """
+    session.info.setdefault("cache_invalidations", set()).add((cache, key))
+
+
+def _history_values(target, attr):
+    history = inspect(target).attrs[attr].history
+    return {value for value in history.sum() if value is not None}
+
+
+@event.listens_for(Scientist, "after_insert")
+@event.listens_for(Scientist, "after_update")
+@event.listens_for(Scientist, "after_delete")
+def _scientist_changed(mapper, connection, target):
+    invalidate_on_commit(inspect(target).session, scientist_cache, target.id)
+
+
+@event.listens_for(Mission, "after_insert")
+@event.listens_for(Mission, "after_update")
+@event.listens_for(Mission, "after_delete")
+def _mission_changed(mapper, connection, target):
+    # Scientist details embed their missions; planets carry mission counts.
+    session = inspect(target).session
+    for scientist_id in _history_values(target, "scientist_id"):
+        invalidate_on_commit(session, scientist_cache, scientist_id)
+    for planet_id in _history_values(target, "planet_id"):
+        invalidate_on_commit(session, planet_cache, planet_id)
+
+
+@event.listens_for(Planet, "after_insert")
+@event.listens_for(Planet, "after_update")
+@event.listens_for(Planet, "after_delete")
+def _planet_changed(mapper, connection, target):
+    # Any scientist detail may embed this planet.
+    session = inspect(target).session
+    invalidate_on_commit(session, planet_cache, target.id)
+    invalidate_on_commit(session, scientist_cache, ALL)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _bulk_statement(orm_execute_state):
+    if not (
+        orm_execute_state.is_insert
+        or orm_execute_state.is_update
+        or orm_execute_state.is_delete
+    ):
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is None:
+        return
+    session = orm_execute_state.session
+    if mapper.class_ in (Planet, Mission):
+        invalidate_on_commit(session, planet_cache, ALL)
+    if mapper.class_ in (Planet, Scientist, Mission):
+        invalidate_on_commit(session, scientist_cache, ALL)
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_invalidations(session):
+    for cache, key in session.info.pop("cache_invalidations", ()):
+        if key is ALL:
+            cache.clear()
+        else:
+            cache.invalidate(key)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_invalidations(session, previous_transaction):
+    session.info.pop("cache_invalidations", None)
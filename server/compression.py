@@ -0,0 +1,132 @@
+"""Response compression negotiated from ``Accept-Encoding``.
+
+With ``COMPRESS`` on, JSON and text responses of at least
+``COMPRESS_MIN_SIZE`` bytes are sent as brotli (when the optional ``brotli``
+package is installed) or gzip, whichever the client prefers. Streamed
+responses such as ``/export/<table>`` are compressed chunk by chunk.
+
+A compressed response that carries a strong ETag (see etags.py) keeps its
+body in ``compressed_cache`` under its exact path and query string, its ETag
+and its encoding, and is sent with the ETag ``<etag>-<encoding>``. Since an
+ETag changes whenever the tables behind it do, :func:`precompressed` can
+answer a repeat of the same request from that cache before the handler
+runs, without querying, serializing or compressing anything.
+"""
+
+import gzip
+import zlib
+
+from flask import current_app, request
+
+from cache import MISSING, compressed_cache
+
+try:
+    import brotli
+except ImportError:  # optional dependency
+    brotli = None
+
+COMPRESSIBLE = frozenset((
+    "application/json", "application/x-ndjson", "text/plain", "text/html",
+))
+# Server preference, best first.
+ENCODINGS = ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def variants(tag):
+    """Every ETag a representation of ``tag`` may have been sent with."""
+    return (tag, *(f"{tag}-{encoding}" for encoding in ENCODINGS))
+
+
+def _negotiate():
+    if not current_app.config.get("COMPRESS"):
+        return None
+    return request.accept_encodings.best_match(ENCODINGS)
+
+
+def _compress(data, encoding, config):
+    if encoding == "br":
+        return brotli.compress(data, quality=config["COMPRESS_BROTLI_QUALITY"])
+    return gzip.compress(data, compresslevel=config["COMPRESS_LEVEL"], mtime=0)
+
+
+def _compress_stream(chunks, encoding, config):
+    if encoding == "br":
+        compressor = brotli.Compressor(quality=config["COMPRESS_BROTLI_QUALITY"])
+        compress, finish = compressor.process, compressor.finish
+    else:
+        # wbits=31 writes a gzip header and trailer.
+        compressor = zlib.compressobj(config["COMPRESS_LEVEL"], zlib.DEFLATED, 31)
+        compress, finish = compressor.compress, compressor.flush
+    for chunk in chunks:
+        if isinstance(chunk, str):
+            chunk = chunk.encode()
+        data = compress(chunk)
+        if data:
+            yield data
+    yield finish()
+
+
+def _encoded(response, encoding, tag=None):
+    response.headers["Content-Encoding"] = encoding
+    response.vary.add("Accept-Encoding")
+    if tag is not None:
+        response.set_etag(f"{tag}-{encoding}")
+    return response
+
+
+def precompressed(tag):
+    """The cached compressed response for ``tag``, or ``None``."""
+    encoding = _negotiate()
+    if encoding is None:
+        return None
+    cached = compressed_cache.get((request.full_path, tag, encoding))
+    if cached is MISSING:
+        return None
+    mimetype, body = cached
+    return _encoded(
+        current_app.response_class(body, mimetype=mimetype), encoding, tag
+    )
+
+
+def _after_request(response):
+    config = current_app.config
+    if not config.get("COMPRESS") or "Content-Encoding" in response.headers:
+        return response
+    if response.status_code == 304:
+        response.vary.add("Accept-Encoding")
+        return response
+    if response.status_code != 200 or response.mimetype not in COMPRESSIBLE:
+        return response
+    response.vary.add("Accept-Encoding")
+    encoding = _negotiate()
+    if encoding is None:
+        return response
+
+    if response.is_streamed:
+        response.response = _compress_stream(response.response, encoding, config)
+        response.headers.pop("Content-Length", None)
+        return _encoded(response, encoding)
+
+    data = response.get_data()
+    if len(data) < config["COMPRESS_MIN_SIZE"]:
+        return response
+    tag, weak = response.get_etag()
+    body = _compress(data, encoding, config)
+    if tag and not weak:
+        compressed_cache.set(
+            (request.full_path, tag, encoding), (response.mimetype, body)
+        )
+    else:
+        tag = None
+    response.set_data(body)
+    return _encoded(response, encoding, tag)
+
+
+def init_compression(app):
+    """Compress ``app``'s responses when ``COMPRESS`` is set.
+
+    Call this after the other ``init_*`` functions: Flask runs
+    ``after_request`` hooks in reverse, so compression then runs first and
+    the request timings in metrics.py include it.
+    """
+    app.after_request(_after_request)
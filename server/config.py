@@ -0,0 +1,107 @@
+import os
+
+
+class Config:
+    SQLALCHEMY_DATABASE_URI = os.environ.get("DB_URI", "sqlite:///app.db")
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+    SQLALCHEMY_ENGINE_OPTIONS = {}
+    # PRAGMA name -> value, issued on every new SQLite connection.
+    SQLITE_PRAGMAS = {}
+    # Entries per in-process LRU cache and their lifetime in seconds.
+    CACHE_SIZE = int(os.environ.get("CACHE_SIZE", 1024))
+    CACHE_TTL = float(os.environ.get("CACHE_TTL", 60))
+    # Requests sending X-Profile: <PROFILE_SECRET>, or one in every
+    # PROFILE_SAMPLE_RATE requests, are written to PROFILE_DIR as .pstats.
+    PROFILE_SECRET = os.environ.get("PROFILE_SECRET")
+    PROFILE_SAMPLE_RATE = int(os.environ.get("PROFILE_SAMPLE_RATE", 0))
+    PROFILE_DIR = os.environ.get("PROFILE_DIR", "profiles")
+    # Optional read-only replica for GET /scientists and /scientists/<id>:
+    # the primary opened read-only (sqlite:///file:app.db?mode=ro&uri=true)
+    # or a snapshot copy refreshed by ``python replica.py``. Pooled replica
+    # connections are reopened after REPLICA_LAG seconds so they see a new
+    # snapshot, and a client is kept on the primary for REPLICA_LAG seconds
+    # after each write; set it above the replica's refresh interval.
+    REPLICA_LAG = float(os.environ.get("REPLICA_LAG", 5))
+    SQLALCHEMY_BINDS = (
+        {"replica": {"url": os.environ["DB_REPLICA_URI"],
+                     "pool_recycle": REPLICA_LAG}}
+        if os.environ.get("DB_REPLICA_URI") else {}
+    )
+    # Pretty-printed JSON by default; production drops the whitespace.
+    JSON_COMPACT = False
+    # Compress JSON and text responses of at least COMPRESS_MIN_SIZE bytes
+    # with brotli (if installed) or gzip, as the client's Accept-Encoding
+    # allows. Compressed bodies of ETagged responses are kept in an LRU of
+    # COMPRESS_CACHE_SIZE entries; see compression.py.
+    COMPRESS = False
+    COMPRESS_MIN_SIZE = int(os.environ.get("COMPRESS_MIN_SIZE", 1024))
+    COMPRESS_LEVEL = int(os.environ.get("COMPRESS_LEVEL", 6))
+    COMPRESS_BROTLI_QUALITY = int(os.environ.get("COMPRESS_BROTLI_QUALITY", 3))
+    COMPRESS_CACHE_SIZE = int(os.environ.get("COMPRESS_CACHE_SIZE", 256))
+    # Opt-in group commit for POST /missions: queued missions are inserted
+    # in batches of up to WRITE_BEHIND_BATCH rows, written once full or
+    # WRITE_BEHIND_WAIT_MS after the first row arrived. At 0 a batch is
+    # whatever queued up while the previous one committed, which already
+    # grows with the number of concurrent writers. A request still waiting
+    # to be written after WRITE_BEHIND_TIMEOUT seconds gets a 503. See
+    # writebehind.py.
+    WRITE_BEHIND = os.environ.get("WRITE_BEHIND") == "1"
+    WRITE_BEHIND_BATCH = int(os.environ.get("WRITE_BEHIND_BATCH", 256))
+    WRITE_BEHIND_WAIT_MS = float(os.environ.get("WRITE_BEHIND_WAIT_MS", 0))
+    WRITE_BEHIND_TIMEOUT = float(os.environ.get("WRITE_BEHIND_TIMEOUT", 1))
+    # Endpoint -> {"concurrency": reads running at once, "queue": reads
+    # waiting for a slot}, for the handlers wrapped in admission.admitted;
+    # 304s and cached responses skip the limit. A read that cannot queue,
+    # or waits ADMISSION_TIMEOUT seconds, gets a 503. See admission.py.
+    ADMISSION_LIMITS = {}
+    ADMISSION_TIMEOUT = float(os.environ.get("ADMISSION_TIMEOUT", 1))
+    # Register Flask-Migrate for the ``flask db`` commands; off by default
+    # so serving processes skip importing Alembic. Run migrations with
+    # ``MIGRATE=1 flask db upgrade``.
+    MIGRATE = os.environ.get("MIGRATE") == "1"
+
+
+class DevelopmentConfig(Config):
+    pass
+
+
+class ProductionConfig(Config):
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        "pool_size": int(os.environ.get("DB_POOL_SIZE", 10)),
+        "max_overflow": int(os.environ.get("DB_MAX_OVERFLOW", 10)),
+        "pool_recycle": int(os.environ.get("DB_POOL_RECYCLE", 3600)),
+    }
+    SQLITE_PRAGMAS = {
+        # Readers no longer block the writer, and commits only fsync the
+        # WAL at checkpoints instead of on every transaction.
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "busy_timeout": int(os.environ.get("DB_BUSY_TIMEOUT_MS", 5000)),
+        # Negative cache_size is in KiB.
+        "cache_size": -int(os.environ.get("DB_CACHE_KB", 64000)),
+        "mmap_size": int(os.environ.get("DB_MMAP_BYTES", 256 * 1024 * 1024)),
+    }
+    JSON_COMPACT = True
+    COMPRESS = True
+    ADMISSION_LIMITS = {
+        "scientists": {"concurrency": 4, "queue": 16},
+        "planets": {"concurrency": 4, "queue": 16},
+        "export": {"concurrency": 2, "queue": 2},
+    }
+
+
+class TestingConfig(Config):
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = os.environ.get("DB_URI", "sqlite:///:memory:")
+
+
+configs = {
+    "development": DevelopmentConfig,
+    "production": ProductionConfig,
+    "testing": TestingConfig,
+}
+
+
+def get_config(name=None):
+    """Config class for ``name``, or for ``$APP_CONFIG`` when omitted."""
+    return configs[name or os.environ.get("APP_CONFIG", "development")]
@@ -1,8 +1,8 @@
 #!/usr/bin/env python3
 
-from app import app
+from app import create_app
 from models import db, Planet, Scientist, Mission
 
 if __name__ == '__main__':
-    with app.app_context():
+    with create_app().app_context():
         import ipdb; ipdb.set_trace()
\ No newline at end of file
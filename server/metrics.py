@@ -0,0 +1,146 @@
+"""Per-request latency, DB time and query count histograms.
+
+Every request is recorded under its route rule, method and status code into
+fixed-bucket histograms, exposed in the Prometheus text format on
+``/metrics``. DB time and query counts come from ``before_cursor_execute`` /
+``after_cursor_execute`` hooks on the engine. Recording is a couple of
+``perf_counter()`` calls and a bisect per histogram, so the cost per request
+stays in the low microseconds.
+
+Streamed responses are recorded when their headers are sent, so the time
+spent writing the body of ``/export/<table>`` is not included.
+"""
+
+import threading
+from bisect import bisect_left
+from contextvars import ContextVar
+from time import perf_counter
+
+from flask import Response, request
+from sqlalchemy import event
+
+from models import db
+
+LATENCY_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5,
+)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+# [start, db_seconds, queries] for the request being handled.
+_current = ContextVar("request_metrics", default=None)
+
+
+class Histogram:
+    """Cumulative-bucket histogram keyed by a tuple of label values."""
+
+    def __init__(self, name, help, labels, buckets):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, label_values, value):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [
+                    [0] * (len(self.buckets) + 1), 0.0, 0
+                ]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def expose(self):
+        lines = [
+            f"# HELP {self.name} {self.help}",
+            f"# TYPE {self.name} histogram",
+        ]
+        with self._lock:
+            series = [(k, list(c), s, n) for k, (c, s, n) in self._series.items()]
+        for label_values, counts, total, count in sorted(series):
+            labels = ",".join(
+                f'{label}="{value}"'
+                for label, value in zip(self.labels, label_values)
+            )
+            cumulative = 0
+            for bound, bucket in zip(self.buckets, counts):
+                cumulative += bucket
+                lines.append(
+                    f'{self.name}_bucket{{{labels},le="{bound}"}} {cumulative}'
+                )
+            lines.append(f'{self.name}_bucket{{{labels},le="+Inf"}} {count}')
+            lines.append(f"{self.name}_sum{{{labels}}} {total}")
+            lines.append(f"{self.name}_count{{{labels}}} {count}")
+        return lines
+
+
+LABELS = ("route", "method", "status")
+request_seconds = Histogram(
+    "http_request_duration_seconds", "Wall time per request.",
+    LABELS, LATENCY_BUCKETS,
+)
+db_seconds = Histogram(
+    "http_request_db_seconds", "Time spent executing SQL per request.",
+    LABELS, LATENCY_BUCKETS,
+)
+queries = Histogram(
+    "http_request_queries", "SQL statements executed per request.",
+    LABELS, QUERY_BUCKETS,
+)
+HISTOGRAMS = (request_seconds, db_seconds, queries)
+
+
+def _before_request():
+    _current.set([perf_counter(), 0.0, 0])
+
+
+def _after_request(response):
+    current = _current.get()
+    if current is None:
+        return response
+    _current.set(None)
+    start, db_time, query_count = current
+    req = request._get_current_object()
+    rule = req.url_rule.rule if req.url_rule else "<unmatched>"
+    labels = (rule, req.method, str(response.status_code))
+    request_seconds.observe(labels, perf_counter() - start)
+    db_seconds.observe(labels, db_time)
+    queries.observe(labels, query_count)
+    return response
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context,
+                           executemany):
+    conn.info["query_start"] = perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context,
+                          executemany):
+    current = _current.get()
+    if current is not None:
+        current[1] += perf_counter() - conn.info.pop("query_start")
+        current[2] += 1
+
+
+def metrics_view():
+    lines = []
+    for histogram in HISTOGRAMS:
+        lines += histogram.expose()
+    return Response(
+        "\n".join(lines) + "\n", mimetype="text/plain; version=0.0.4"
+    )
+
+
+def init_metrics(app):
+    """Instrument ``app`` and its engines, and serve ``/metrics``."""
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    with app.app_context():
+        engines = list(db.engines.values())
+    for engine in engines:
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    app.add_url_rule("/metrics", "metrics", metrics_view)
@@ -0,0 +1,28 @@
+"""add mission indexes
+
+Revision ID: 3b9e5f2c7a41
+Revises: 467f0650e26a
+Create Date: 2026-10-18 09:12:40.518204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3b9e5f2c7a41'
+down_revision = '467f0650e26a'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('missions', schema=None) as batch_op:
+        batch_op.create_index('ix_missions_scientist_id_planet_id', ['scientist_id', 'planet_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_missions_planet_id'), ['planet_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('missions', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_missions_planet_id'))
+        batch_op.drop_index('ix_missions_scientist_id_planet_id')
@@ -0,0 +1,89 @@
+"""add planet counters
+
+Revision ID: 5d2a8c1e9f60
+Revises: 3b9e5f2c7a41
+Create Date: 2026-10-18 11:02:17.340611
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5d2a8c1e9f60'
+down_revision = '3b9e5f2c7a41'
+branch_labels = None
+depends_on = None
+
+TRIGGERS = {
+    'missions_counters_insert': """
+CREATE TRIGGER missions_counters_insert AFTER INSERT ON missions
+BEGIN
+    UPDATE planets SET
+        mission_count = mission_count + 1,
+        scientist_count = scientist_count + NOT EXISTS (
+            SELECT 1 FROM missions
+            WHERE scientist_id = NEW.scientist_id AND planet_id = NEW.planet_id
+                AND id <> NEW.id
+        )
+    WHERE id = NEW.planet_id;
+END""",
+    'missions_counters_delete': """
+CREATE TRIGGER missions_counters_delete AFTER DELETE ON missions
+BEGIN
+    UPDATE planets SET
+        mission_count = mission_count - 1,
+        scientist_count = scientist_count - NOT EXISTS (
+            SELECT 1 FROM missions
+            WHERE scientist_id = OLD.scientist_id AND planet_id = OLD.planet_id
+        )
+    WHERE id = OLD.planet_id;
+END""",
+    'missions_counters_update': """
+CREATE TRIGGER missions_counters_update
+AFTER UPDATE OF scientist_id, planet_id ON missions
+WHEN OLD.scientist_id IS NOT NEW.scientist_id OR OLD.planet_id IS NOT NEW.planet_id
+BEGIN
+    UPDATE planets SET
+        mission_count = mission_count - 1,
+        scientist_count = scientist_count - NOT EXISTS (
+            SELECT 1 FROM missions
+            WHERE scientist_id = OLD.scientist_id AND planet_id = OLD.planet_id
+        )
+    WHERE id = OLD.planet_id;
+    UPDATE planets SET
+        mission_count = mission_count + 1,
+        scientist_count = scientist_count + NOT EXISTS (
+            SELECT 1 FROM missions
+            WHERE scientist_id = NEW.scientist_id AND planet_id = NEW.planet_id
+                AND id <> NEW.id
+        )
+    WHERE id = NEW.planet_id;
+END""",
+}
+
+
+def upgrade():
+    with op.batch_alter_table('planets', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('mission_count', sa.Integer(), server_default='0', nullable=False))
+        batch_op.add_column(sa.Column('scientist_count', sa.Integer(), server_default='0', nullable=False))
+
+    op.execute("""
+UPDATE planets SET
+    mission_count = (
+        SELECT COUNT(*) FROM missions WHERE planet_id = planets.id
+    ),
+    scientist_count = (
+        SELECT COUNT(DISTINCT scientist_id) FROM missions WHERE planet_id = planets.id
+    )""")
+    for trigger in TRIGGERS.values():
+        op.execute(trigger)
+
+
+def downgrade():
+    for name in TRIGGERS:
+        op.execute(f"DROP TRIGGER IF EXISTS {name}")
+
+    with op.batch_alter_table('planets', schema=None) as batch_op:
+        batch_op.drop_column('scientist_count')
+        batch_op.drop_column('mission_count')
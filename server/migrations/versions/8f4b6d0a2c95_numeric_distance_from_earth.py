@@ -0,0 +1,43 @@
+"""numeric distance_from_earth
+
+Revision ID: 8f4b6d0a2c95
+Revises: 5d2a8c1e9f60
+Create Date: 2026-10-18 11:47:52.104327
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8f4b6d0a2c95'
+down_revision = '5d2a8c1e9f60'
+branch_labels = None
+depends_on = None
+
+
+# The column is swapped with ADD/DROP/RENAME COLUMN (SQLite 3.35+) rather
+# than a batch table rebuild, which SQLite rejects while the missions
+# counter triggers reference planets.
+
+
+def upgrade():
+    op.execute("ALTER TABLE planets ADD COLUMN distance INTEGER")
+    # Keep the leading integer of each stored string ("12 light years" -> 12)
+    # and leave values that do not start with one empty.
+    op.execute("""
+UPDATE planets SET distance = CASE
+    WHEN trim(distance_from_earth) GLOB '[0-9]*'
+    THEN CAST(trim(distance_from_earth) AS INTEGER)
+END""")
+    op.execute("ALTER TABLE planets DROP COLUMN distance_from_earth")
+    op.execute("ALTER TABLE planets RENAME COLUMN distance TO distance_from_earth")
+    op.create_index(op.f('ix_planets_distance_from_earth'), 'planets', ['distance_from_earth'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_planets_distance_from_earth'), table_name='planets')
+    op.execute("ALTER TABLE planets ADD COLUMN distance VARCHAR")
+    op.execute("UPDATE planets SET distance = CAST(distance_from_earth AS TEXT)")
+    op.execute("ALTER TABLE planets DROP COLUMN distance_from_earth")
+    op.execute("ALTER TABLE planets RENAME COLUMN distance TO distance_from_earth")
@@ -0,0 +1,72 @@
+"""mission counter exists probes
+
+Revision ID: a9c3e6f21d47
+Revises: e7d3a1f5b290
+Create Date: 2026-10-18 17:40:03.118204
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'a9c3e6f21d47'
+down_revision = 'e7d3a1f5b290'
+branch_labels = None
+depends_on = None
+
+# The insert and update triggers counted every mission of the pair to tell
+# whether the new one was its first, which made inserts slow down as a pair
+# filled up; an EXISTS probe for any other mission stops at the first one.
+FIRST_MISSION = {
+    'new': """NOT EXISTS (
+            SELECT 1 FROM missions
+            WHERE scientist_id = NEW.scientist_id AND planet_id = NEW.planet_id
+                AND id <> NEW.id
+        )""",
+    'old': """(
+            SELECT COUNT(*) = 1 FROM missions
+            WHERE scientist_id = NEW.scientist_id AND planet_id = NEW.planet_id
+        )""",
+}
+
+INSERT_TRIGGER = """
+CREATE TRIGGER missions_counters_insert AFTER INSERT ON missions
+BEGIN
+    UPDATE planets SET
+        mission_count = mission_count + 1,
+        scientist_count = scientist_count + {first}
+    WHERE id = NEW.planet_id;
+END"""
+
+UPDATE_TRIGGER = """
+CREATE TRIGGER missions_counters_update
+AFTER UPDATE OF scientist_id, planet_id ON missions
+WHEN OLD.scientist_id IS NOT NEW.scientist_id OR OLD.planet_id IS NOT NEW.planet_id
+BEGIN
+    UPDATE planets SET
+        mission_count = mission_count - 1,
+        scientist_count = scientist_count - NOT EXISTS (
+            SELECT 1 FROM missions
+            WHERE scientist_id = OLD.scientist_id AND planet_id = OLD.planet_id
+        )
+    WHERE id = OLD.planet_id;
+    UPDATE planets SET
+        mission_count = mission_count + 1,
+        scientist_count = scientist_count + {first}
+    WHERE id = NEW.planet_id;
+END"""
+
+
+def replace_triggers(first):
+    op.execute("DROP TRIGGER IF EXISTS missions_counters_insert")
+    op.execute("DROP TRIGGER IF EXISTS missions_counters_update")
+    op.execute(INSERT_TRIGGER.format(first=first))
+    op.execute(UPDATE_TRIGGER.format(first=first))
+
+
+def upgrade():
+    replace_triggers(FIRST_MISSION['new'])
+
+
+def downgrade():
+    replace_triggers(FIRST_MISSION['old'])
@@ -0,0 +1,61 @@
+"""add scientist search
+
+Revision ID: c41e7a9b3d18
+Revises: 8f4b6d0a2c95
+Create Date: 2026-10-18 14:20:45.118302
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c41e7a9b3d18'
+down_revision = '8f4b6d0a2c95'
+branch_labels = None
+depends_on = None
+
+TRIGGERS = {
+    'scientists_fts_insert': """
+CREATE TRIGGER scientists_fts_insert AFTER INSERT ON scientists
+BEGIN
+    INSERT INTO scientists_fts(rowid, name, field_of_study)
+    VALUES (NEW.id, NEW.name, NEW.field_of_study);
+END""",
+    'scientists_fts_delete': """
+CREATE TRIGGER scientists_fts_delete AFTER DELETE ON scientists
+BEGIN
+    INSERT INTO scientists_fts(scientists_fts, rowid, name, field_of_study)
+    VALUES ('delete', OLD.id, OLD.name, OLD.field_of_study);
+END""",
+    'scientists_fts_update': """
+CREATE TRIGGER scientists_fts_update
+AFTER UPDATE OF id, name, field_of_study ON scientists
+BEGIN
+    INSERT INTO scientists_fts(scientists_fts, rowid, name, field_of_study)
+    VALUES ('delete', OLD.id, OLD.name, OLD.field_of_study);
+    INSERT INTO scientists_fts(rowid, name, field_of_study)
+    VALUES (NEW.id, NEW.name, NEW.field_of_study);
+END""",
+}
+
+
+def upgrade():
+    op.execute("""
+CREATE VIRTUAL TABLE scientists_fts USING fts5(
+    name, field_of_study,
+    content='scientists', content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+)""")
+    op.execute(
+        "INSERT INTO scientists_fts(scientists_fts, rank) VALUES ('rank', 'bm25(10.0, 1.0)')"
+    )
+    op.execute("INSERT INTO scientists_fts(scientists_fts) VALUES ('rebuild')")
+    for trigger in TRIGGERS.values():
+        op.execute(trigger)
+
+
+def downgrade():
+    for name in TRIGGERS:
+        op.execute(f"DROP TRIGGER IF EXISTS {name}")
+    op.execute("DROP TABLE IF EXISTS scientists_fts")
@@ -0,0 +1,26 @@
+"""add scientist version
+
+Revision ID: e7d3a1f5b290
+Revises: c41e7a9b3d18
+Create Date: 2026-10-18 15:05:12.604917
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e7d3a1f5b290'
+down_revision = 'c41e7a9b3d18'
+branch_labels = None
+depends_on = None
+
+
+# Plain ADD/DROP COLUMN rather than batch_alter_table: rebuilding scientists
+# would drop the scientists_fts triggers along with the old table.
+def upgrade():
+    op.add_column('scientists', sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade():
+    op.execute("ALTER TABLE scientists DROP COLUMN version")
@@ -1,5 +1,20 @@
+import os
+import weakref
+
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import MetaData, UniqueConstraint, DateTime
+from flask_sqlalchemy.session import Session
+from sqlalchemy import (
+    DDL,
+    MetaData,
+    UniqueConstraint,
+    DateTime,
+    distinct,
+    event,
+    column,
+    func,
+    select,
+    table,
+)
 from sqlalchemy.orm import validates
 from sqlalchemy.ext.associationproxy import association_proxy
 from sqlalchemy_serializer import SerializerMixin
@@ -15,7 +30,68 @@ convention = {
 
 metadata = MetaData(naming_convention=convention)
 
-db = SQLAlchemy(metadata=metadata)
+# Bind key of the optional read-only replica in SQLALCHEMY_BINDS.
+REPLICA = "replica"
+
+
+class RoutingSession(Session):
+    """Send SELECTs to the ``replica`` bind while ``info["replica"]`` is set.
+
+    Flushes and every other statement stay on the primary, as do all reads
+    when no replica is configured. ``replica.replica_reads`` sets the flag
+    for the duration of a read-only handler.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if (
+            bind is None
+            and self.info.get("replica")
+            and not self._flushing
+            and getattr(clause, "is_select", False)
+        ):
+            engine = self._db.engines.get(REPLICA)
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+db = SQLAlchemy(metadata=metadata, session_options={"class_": RoutingSession})
+
+
+# Engines created by init_db, for _dispose_after_fork.
+_engines = weakref.WeakSet()
+
+
+def _dispose_after_fork():
+    # A pre-fork server's workers inherit the parent's pooled connections;
+    # drop them (without closing the parent's) so each worker opens its own.
+    for engine in list(_engines):
+        engine.dispose(close=False)
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_dispose_after_fork)
+
+
+def init_db(app):
+    """Bind ``db`` to ``app`` and apply its ``SQLITE_PRAGMAS`` on connect.
+
+    The app's engines are disposed in forked children.
+    """
+    db.init_app(app)
+    with app.app_context():
+        engine = db.engine
+        _engines.update(db.engines.values())
+    pragmas = app.config.get("SQLITE_PRAGMAS")
+    if not pragmas or engine.dialect.name != "sqlite":
+        return
+
+    @event.listens_for(engine, "connect")
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
 
 
 class Planet(db.Model, SerializerMixin):
@@ -23,9 +99,12 @@ class Planet(db.Model, SerializerMixin):
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String)
-    distance_from_earth = db.Column(db.String)
+    distance_from_earth = db.Column(db.Integer, index=True)
     nearest_star = db.Column(db.String)
     image = db.Column(db.String)
+    # Kept up to date by the MISSION_COUNTER_TRIGGERS below.
+    mission_count = db.Column(db.Integer, nullable=False, server_default="0")
+    scientist_count = db.Column(db.Integer, nullable=False, server_default="0")
     # created_at = db.Column(db.DateTime, db.func.now())
     # updated_at = db.Column(db.DateTime, db.func.now())
 
@@ -40,6 +119,15 @@ class Planet(db.Model, SerializerMixin):
         "image",
     )
 
+    @validates("distance_from_earth")
+    def validates_distance_from_earth(self, key, distance_from_earth):
+        if distance_from_earth is None:
+            return None
+        try:
+            return int(distance_from_earth)
+        except (TypeError, ValueError):
+            raise ValueError("Invalid distance_from_earth")
+
 
 class Scientist(db.Model, SerializerMixin):
     __tablename__ = 'scientists'
@@ -48,17 +136,22 @@ class Scientist(db.Model, SerializerMixin):
     name = db.Column(db.String, nullable=False, unique=True)
     field_of_study = db.Column(db.String, nullable=False)
     avatar = db.Column(db.String)
+    # Bumped on every UPDATE; writers that send a stale version get a 409.
+    version = db.Column(db.Integer, nullable=False, server_default="1")
     # created_at = db.Column(db.DateTime, db.func.now())
     # updated_at = db.Column(db.DateTime, db.func.now())
 
     scientist_missions = db.relationship("Mission", back_populates="scientist")
     planets = association_proxy("scientist_missions", "planet")
 
+    __mapper_args__ = {"version_id_col": version}
+
     serialize_only = (
         "id",
         "name",
         "field_of_study",
         "avatar",
+        "version",
     )
 
     @validates("name")
@@ -75,13 +168,17 @@ class Scientist(db.Model, SerializerMixin):
 
 class Mission(db.Model, SerializerMixin):
     __tablename__ = 'missions'
+    # (scientist_id, planet_id) also serves lookups on scientist_id alone.
+    __table_args__ = (
+        db.Index("ix_missions_scientist_id_planet_id", "scientist_id", "planet_id"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String, nullable=False)
     # created_at = db.Column(db.DateTime, db.func.now())
     # updated_at = db.Column(db.DateTime, db.func.now())
     scientist_id = db.Column(db.Integer, db.ForeignKey("scientists.id"), nullable=False)
-    planet_id = db.Column(db.Integer, db.ForeignKey("planets.id"), nullable=False)
+    planet_id = db.Column(db.Integer, db.ForeignKey("planets.id"), nullable=False, index=True)
 
     scientist = db.relationship("Scientist", back_populates="scientist_missions")
     planet = db.relationship("Planet", back_populates="planet_missions")
@@ -110,4 +207,129 @@ class Mission(db.Model, SerializerMixin):
         if not planet_id:
             raise ValueError("Invalid planet_id")
         return planet_id
-    
\ No newline at end of file
+    
+
+
+def mission_aggregates():
+    """Per-planet mission and distinct scientist counts, in one GROUP BY."""
+    return select(
+        Mission.planet_id,
+        func.count(Mission.id).label("mission_count"),
+        func.count(distinct(Mission.scientist_id)).label("scientist_count"),
+    ).group_by(Mission.planet_id)
+
+
+# Maintain planets.mission_count and planets.scientist_count on every write
+# to missions, whichever path it takes. The "is this the scientist's
+# first/last mission here" checks are EXISTS probes that stop at the first
+# other mission the (scientist_id, planet_id) index finds, so their cost does
+# not grow with the number of missions a pair already has.
+MISSION_COUNTER_TRIGGERS = {
+    "missions_counters_insert": """
+CREATE TRIGGER missions_counters_insert AFTER INSERT ON missions
+BEGIN
+    UPDATE planets SET
+        mission_count = mission_count + 1,
+        scientist_count = scientist_count + NOT EXISTS (
+            SELECT 1 FROM missions
+            WHERE scientist_id = NEW.scientist_id AND planet_id = NEW.planet_id
+                AND id <> NEW.id
+        )
+    WHERE id = NEW.planet_id;
+END""",
+    "missions_counters_delete": """
+CREATE TRIGGER missions_counters_delete AFTER DELETE ON missions
+BEGIN
+    UPDATE planets SET
+        mission_count = mission_count - 1,
+        scientist_count = scientist_count - NOT EXISTS (
+            SELECT 1 FROM missions
+            WHERE scientist_id = OLD.scientist_id AND planet_id = OLD.planet_id
+        )
+    WHERE id = OLD.planet_id;
+END""",
+    "missions_counters_update": """
+CREATE TRIGGER missions_counters_update
+AFTER UPDATE OF scientist_id, planet_id ON missions
+WHEN OLD.scientist_id IS NOT NEW.scientist_id OR OLD.planet_id IS NOT NEW.planet_id
+BEGIN
+    UPDATE planets SET
+        mission_count = mission_count - 1,
+        scientist_count = scientist_count - NOT EXISTS (
+            SELECT 1 FROM missions
+            WHERE scientist_id = OLD.scientist_id AND planet_id = OLD.planet_id
+        )
+    WHERE id = OLD.planet_id;
+    UPDATE planets SET
+        mission_count = mission_count + 1,
+        scientist_count = scientist_count + NOT EXISTS (
+            SELECT 1 FROM missions
+            WHERE scientist_id = NEW.scientist_id AND planet_id = NEW.planet_id
+                AND id <> NEW.id
+        )
+    WHERE id = NEW.planet_id;
+END""",
+}
+
+for _trigger in MISSION_COUNTER_TRIGGERS.values():
+    event.listen(
+        Mission.__table__, "after_create", DDL(_trigger).execute_if(dialect="sqlite")
+    )
+
+
+# Full-text index over scientists.name and field_of_study. It is an
+# external-content FTS5 table: it stores only the index and reads the text
+# back from scientists, which the triggers below keep it in step with.
+# Names weigh ten times as much as fields of study in the bm25 rank.
+SCIENTIST_SEARCH_TABLE = (
+    """
+CREATE VIRTUAL TABLE scientists_fts USING fts5(
+    name, field_of_study,
+    content='scientists', content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+)""",
+    """
+INSERT INTO scientists_fts(scientists_fts, rank) VALUES ('rank', 'bm25(10.0, 1.0)')""",
+)
+
+SCIENTIST_SEARCH_TRIGGERS = {
+    "scientists_fts_insert": """
+CREATE TRIGGER scientists_fts_insert AFTER INSERT ON scientists
+BEGIN
+    INSERT INTO scientists_fts(rowid, name, field_of_study)
+    VALUES (NEW.id, NEW.name, NEW.field_of_study);
+END""",
+    "scientists_fts_delete": """
+CREATE TRIGGER scientists_fts_delete AFTER DELETE ON scientists
+BEGIN
+    INSERT INTO scientists_fts(scientists_fts, rowid, name, field_of_study)
+    VALUES ('delete', OLD.id, OLD.name, OLD.field_of_study);
+END""",
+    "scientists_fts_update": """
+CREATE TRIGGER scientists_fts_update
+AFTER UPDATE OF id, name, field_of_study ON scientists
+BEGIN
+    INSERT INTO scientists_fts(scientists_fts, rowid, name, field_of_study)
+    VALUES ('delete', OLD.id, OLD.name, OLD.field_of_study);
+    INSERT INTO scientists_fts(rowid, name, field_of_study)
+    VALUES (NEW.id, NEW.name, NEW.field_of_study);
+END""",
+}
+
+REBUILD_SCIENTIST_SEARCH = (
+    "INSERT INTO scientists_fts(scientists_fts) VALUES ('rebuild')"
+)
+
+scientists_fts = table(
+    "scientists_fts", column("rowid"), column("rank"), column("scientists_fts")
+)
+
+for _ddl in (*SCIENTIST_SEARCH_TABLE, *SCIENTIST_SEARCH_TRIGGERS.values()):
+    event.listen(
+        Scientist.__table__, "after_create", DDL(_ddl).execute_if(dialect="sqlite")
+    )
+event.listen(
+    Scientist.__table__,
+    "before_drop",
+    DDL("DROP TABLE IF EXISTS scientists_fts").execute_if(dialect="sqlite"),
+)
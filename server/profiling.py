@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""Opt-in cProfile capture for single requests.
+
+A request is profiled when it carries ``X-Profile: <PROFILE_SECRET>`` or,
+with ``PROFILE_SAMPLE_RATE = N``, for one request in every N. Each profile is
+written to ``PROFILE_DIR`` as a ``.pstats`` file named after the method,
+route and wall time, ready for ``snakeviz``/``flameprof`` or for::
+
+    python profiling.py profiles/ --top 15
+
+which merges the files for each endpoint and lists its hottest functions.
+"""
+
+import cProfile
+import hmac
+import itertools
+import os
+import re
+import time
+from collections import defaultdict
+
+from flask import current_app, g, request
+
+PROFILE_HEADER = "X-Profile"
+
+_requests = itertools.count(1)
+
+
+def _should_profile(config):
+    secret = config.get("PROFILE_SECRET")
+    header = request.headers.get(PROFILE_HEADER)
+    if secret and header and hmac.compare_digest(header, secret):
+        return True
+    rate = config.get("PROFILE_SAMPLE_RATE", 0)
+    return rate > 0 and next(_requests) % rate == 0
+
+
+def _before_request():
+    if _should_profile(current_app.config):
+        g.profile = cProfile.Profile()
+        g.profile_start = time.perf_counter()
+        g.profile.enable()
+
+
+def _after_request(response):
+    profile = g.pop("profile", None)
+    if profile is None:
+        return response
+    profile.disable()
+    elapsed_ms = (time.perf_counter() - g.pop("profile_start")) * 1000
+    rule = request.url_rule.rule if request.url_rule else "unmatched"
+    route = re.sub(r"[^A-Za-z0-9]+", "_", rule).strip("_") or "root"
+    directory = current_app.config.get("PROFILE_DIR", "profiles")
+    os.makedirs(directory, exist_ok=True)
+    profile.dump_stats(
+        os.path.join(
+            directory,
+            f"{request.method}__{route}__{elapsed_ms:.0f}ms__"
+            f"{time.time_ns()}.pstats",
+        )
+    )
+    return response
+
+
+def init_profiler(app):
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+
+
+def endpoint_files(directory):
+    """Group the ``.pstats`` files in ``directory`` by ``METHOD route``."""
+    endpoints = defaultdict(list)
+    for name in sorted(os.listdir(directory)):
+        if name.endswith(".pstats") and name.count("__") == 3:
+            method, route, _, _ = name.split("__")
+            endpoints[f"{method} {route}"].append(os.path.join(directory, name))
+    return endpoints
+
+
+def hot_functions(files, top=10, sort="cumulative"):
+    """Merge ``files`` and return ``top`` (function, calls, tottime, cumtime)."""
+    import pstats
+
+    stats = pstats.Stats(*files)
+    stats.sort_stats(sort)
+    rows = []
+    for func in stats.fcn_list[:top]:
+        calls, _, tottime, cumtime, _ = stats.stats[func]
+        rows.append((pstats.func_std_string(func), calls, tottime, cumtime))
+    return rows
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="List the hottest functions per endpoint."
+    )
+    parser.add_argument("directory", nargs="?", default="profiles")
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--sort", default="cumulative",
+                        choices=["cumulative", "tottime", "calls"])
+    args = parser.parse_args()
+
+    for endpoint, files in endpoint_files(args.directory).items():
+        print(f"\n{endpoint} ({len(files)} profiles)")
+        print(f"{'calls':>10} {'tottime':>9} {'cumtime':>9}  function")
+        for func, calls, tottime, cumtime in hot_functions(
+            files, args.top, args.sort
+        ):
+            print(f"{calls:>10} {tottime:>9.4f} {cumtime:>9.4f}  {func}")
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""Read/write routing to an optional read-only replica.
+
+GET handlers wrapped in :func:`replica_reads` run their SELECTs against the
+``replica`` bind (see ``RoutingSession`` in models.py); everything else,
+including every flush, stays on the primary. A successful write request
+sets a short-lived cookie that keeps that client on the primary for
+``REPLICA_LAG`` seconds, so it reads its own writes while the replica
+catches up.
+
+Responses served from the replica may trail the primary, so they carry no
+ETag and are not stored in the scientist cache.
+
+A snapshot replica can be refreshed from cron with::
+
+    python replica.py instance/app.db instance/replica.db
+"""
+
+import math
+import os
+import sqlite3
+import time
+from functools import wraps
+
+from flask import current_app, request
+from sqlalchemy import event
+
+from models import db, REPLICA
+
+PRIMARY_COOKIE = "read_primary_until"
+WRITE_METHODS = frozenset(("POST", "PUT", "PATCH", "DELETE"))
+
+
+def _wrote_recently():
+    try:
+        return float(request.cookies.get(PRIMARY_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+def reading_replica():
+    """Whether the current request's reads go to the replica."""
+    return db.session.info.get("replica", False)
+
+
+def replica_reads(get):
+    """Route the SELECTs of a Flask-RESTful ``get`` to the replica.
+
+    Applied outside :func:`etags.conditional`, so a replica response drops
+    the ETag that was computed from the primary's table versions.
+    """
+
+    @wraps(get)
+    def wrapper(*args, **kwargs):
+        if REPLICA not in db.engines or _wrote_recently():
+            return get(*args, **kwargs)
+        session = db.session()
+        session.info["replica"] = True
+        try:
+            result = get(*args, **kwargs)
+        finally:
+            session.info.pop("replica", None)
+        if isinstance(result, tuple) and len(result) == 3:
+            data, code, headers = result
+            headers = {k: v for k, v in headers.items() if k != "ETag"}
+            return data, code, headers
+        return result
+
+    return wrapper
+
+
+def _after_request(response):
+    if request.method in WRITE_METHODS and response.status_code < 400:
+        lag = current_app.config["REPLICA_LAG"]
+        response.set_cookie(
+            PRIMARY_COOKIE,
+            f"{time.time() + lag:.3f}",
+            max_age=math.ceil(lag),
+            httponly=True,
+            samesite="Lax",
+        )
+    return response
+
+
+def _query_only(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA query_only = ON")
+    cursor.close()
+
+
+def init_replica(app):
+    """Enable replica routing for ``app`` if it configures a ``replica`` bind."""
+    with app.app_context():
+        engine = db.engines.get(REPLICA)
+    if engine is None:
+        return
+    if engine.dialect.name == "sqlite":
+        # Refuse writes even when the replica file itself is writable.
+        event.listen(engine, "connect", _query_only)
+    app.after_request(_after_request)
+
+
+def snapshot(source, target):
+    """Copy the SQLite database ``source`` to ``target`` consistently.
+
+    The copy is made with SQLite's online backup API into a temporary file
+    that then replaces ``target`` atomically, so readers never see a
+    half-written replica.
+    """
+    tmp = f"{target}.tmp"
+    src = sqlite3.connect(source)
+    dst = sqlite3.connect(tmp)
+    try:
+        src.backup(dst)
+    finally:
+        dst.close()
+        src.close()
+    os.replace(tmp, target)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Refresh a snapshot replica of the SQLite database."
+    )
+    parser.add_argument("source", help="primary database file")
+    parser.add_argument("target", help="replica file to replace")
+    args = parser.parse_args()
+    snapshot(args.source, args.target)
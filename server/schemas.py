@@ -0,0 +1,119 @@
+"""Request body schemas compiled from the models.
+
+A :class:`Schema` is built once per model at import time from the table's
+columns and the mapper's ``@validates`` hooks. ``validate`` then checks a raw
+JSON body in one pass: unknown fields, JSON types taken from the column
+types, and the model's own validators, so ``models.py`` stays the single
+source of truth for what a valid value is. Every problem is collected rather
+than only the first, and nothing is built or flushed for a bad body.
+"""
+
+from sqlalchemy import select
+
+from models import db, Scientist, Mission
+
+# JSON types accepted for each column type; bool is not a JSON integer.
+JSON_TYPES = {str: (str,), int: (int,)}
+# SQLite stores integers as signed 64-bit; larger ones overflow on insert.
+INT64_MIN, INT64_MAX = -2**63, 2**63 - 1
+
+
+class ValidationError(ValueError):
+    """A request body failed validation; ``errors`` lists every message."""
+
+    def __init__(self, errors):
+        super().__init__("; ".join(errors))
+        self.errors = errors
+
+
+class Schema:
+    """Validate request bodies for ``fields`` of ``model``.
+
+    ``unique`` names columns with a unique constraint, checked against the
+    table by :meth:`taken` before inserting.
+    """
+
+    def __init__(self, model, fields, unique=()):
+        table = model.__table__
+        validators = model.__mapper__.validators
+        compiled = []
+        for name in fields:
+            column = table.c[name]
+            validator = validators.get(name)
+            compiled.append((
+                name,
+                JSON_TYPES[column.type.python_type],
+                not column.nullable,
+                validator[0] if validator else None,
+            ))
+        self.model = model
+        self.fields = tuple(compiled)
+        self.names = frozenset(fields)
+        self.unique = tuple(table.c[name] for name in unique)
+        # Validators are called unbound with this spare transient instance
+        # as ``self``; it is never added to a session.
+        self._instance = model()
+
+    def validate(self, data, partial=False):
+        """Return the validated values of ``data``.
+
+        With ``partial``, only the fields present are checked, as for a
+        PATCH. Raises :class:`ValidationError` listing every problem.
+        """
+        if not isinstance(data, dict):
+            raise ValidationError([f"Invalid {self.model.__name__.lower()}"])
+        errors = [f"Unknown field {key}" for key in data if key not in self.names]
+        values = {}
+        for name, types, required, validator in self.fields:
+            if name not in data:
+                if partial:
+                    continue
+                value = None
+            else:
+                value = data[name]
+            if value is None:
+                if not required:
+                    values[name] = None
+                    continue
+                if validator is None:
+                    errors.append(f"Missing {name}")
+                    continue
+            elif type(value) not in types or (
+                type(value) is int and not INT64_MIN <= value <= INT64_MAX
+            ):
+                errors.append(f"Invalid {name}")
+                continue
+            if validator is not None:
+                try:
+                    value = validator(self._instance, name, value)
+                except ValueError as error:
+                    errors.append(str(error))
+                    continue
+            values[name] = value
+        if errors:
+            raise ValidationError(errors)
+        return values
+
+    def taken(self, values):
+        """Messages for ``unique`` values in ``values`` that already exist.
+
+        One indexed lookup per unique column, run before the insert so a
+        duplicate is rejected without a failed flush.
+        """
+        errors = []
+        for column in self.unique:
+            value = values.get(column.key)
+            if value is None:
+                continue
+            exists = db.session.execute(
+                select(column).where(column == value).limit(1)
+            ).first()
+            if exists:
+                errors.append(f"Duplicate {column.key}")
+        return errors
+
+
+scientist_schema = Schema(
+    Scientist, ("name", "field_of_study", "avatar"), unique=("name",)
+)
+mission_schema = Schema(Mission, ("name", "scientist_id", "planet_id"))
@@ -1,76 +1,225 @@
-from random import randint, choice as rc
+#!/usr/bin/env python3
 
-from faker import Faker
+import argparse
+import random
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from itertools import repeat
 
-from app import app
-from models import db, Planet, Scientist, Mission
+from faker import Faker
+from sqlalchemy import DDL, delete, update
+
+from app import create_app
+from models import (
+    db,
+    Planet,
+    Scientist,
+    Mission,
+    MISSION_COUNTER_TRIGGERS,
+    REBUILD_SCIENTIST_SEARCH,
+    SCIENTIST_SEARCH_TRIGGERS,
+    mission_aggregates,
+)
 
 fake = Faker()
 
-
-def create_planets():
-    planets = []
-    for _ in range(50):
-        p = Planet(
-            name=fake.first_name(),
-            distance_from_earth=str(randint(100000, 10000000000)),
-            nearest_star=fake.first_name(),
-            image=fake.url(),
+# Faker's name and url providers cost hundreds of microseconds per call, so
+# names are drawn from pools and combined instead of generated row by row;
+# that cost would otherwise dominate at millions of rows.
+NAME_POOL = 500
+MISSION_NAME_POOL = 1000
+
+# Rows are generated as tuples in this column order.
+COLUMNS = {
+    Planet: ("id", "name", "distance_from_earth", "nearest_star", "image"),
+    Scientist: ("id", "name", "field_of_study", "avatar"),
+    Mission: ("id", "name", "scientist_id", "planet_id"),
+}
+
+
+def chunk_rng(seed, table, start):
+    """Seed ``fake`` and return a ``Random`` for one chunk of ``table``.
+
+    Seeding per chunk keeps the output identical however the chunks are
+    spread across worker processes.
+    """
+    chunk_seed = zlib.crc32(f"{seed}:{table}:{start}".encode())
+    fake.seed_instance(chunk_seed)
+    return random.Random(chunk_seed)
+
+
+@lru_cache
+def mission_names(seed):
+    chunk_rng(seed, "mission_names", 0)
+    return [fake.sentence(nb_words=3) for _ in range(MISSION_NAME_POOL)]
+
+
+def planet_rows(start, count, seed):
+    rng = chunk_rng(seed, "planets", start)
+    return [
+        (
+            id,
+            fake.first_name(),
+            rng.randint(100000, 10000000000),
+            fake.first_name(),
+            fake.url(),
         )
-        planets.append(p)
-
-    return planets
-
-
-def create_scientists():
-    scientists = []
-    names = []
-    for _ in range(100):
-        name = fake.name()
-        while name in names:
-            name = fake.name()
-        names.append(name)
-
-        s = Scientist(
-            name=name, field_of_study=fake.sentence(), avatar=fake.url()
+        for id in range(start, start + count)
+    ]
+
+
+def scientist_rows(start, count, seed):
+    rng = chunk_rng(seed, "scientists", start)
+    pool = min(count, NAME_POOL)
+    first_names = [fake.first_name() for _ in range(pool)]
+    last_names = [fake.last_name() for _ in range(pool)]
+    rows = []
+    for id in range(start, start + count):
+        name = f"{rng.choice(first_names)} {rng.choice(last_names)}"
+        avatar = (
+            f"https://robohash.org/{name.lower().replace(' ', '_')}?set=set5"
+        )
+        rows.append((id, name, fake.sentence(), avatar))
+    return rows
+
+
+def mission_rows(start, count, seed, scientists, planets):
+    rng = chunk_rng(seed, "missions", start)
+    return list(
+        zip(
+            range(start, start + count),
+            rng.choices(mission_names(seed), k=count),
+            rng.choices(range(1, scientists + 1), k=count),
+            rng.choices(range(1, planets + 1), k=count),
         )
-        scientists.append(s)
+    )
+
+
+def unique_names(rows, seen):
+    """Suffix duplicate scientist names with their id, using a set lookup."""
+    for i, (id, name, *rest) in enumerate(rows):
+        if name in seen:
+            name = f"{name} {id}"
+            rows[i] = (id, name, *rest)
+        seen.add(name)
+    return rows
+
+
+def generate(pool, make_rows, total, chunk_size, *args):
+    """Yield chunks of rows from ``make_rows``, in a process pool if given."""
+    starts = range(1, total + 1, chunk_size)
+    counts = [min(chunk_size, total + 1 - start) for start in starts]
+    args = [repeat(arg) for arg in args]
+    if pool is None:
+        return map(make_rows, starts, counts, *args)
+    return pool.map(make_rows, starts, counts, *args)
+
+
+def load(connection, model, chunks):
+    """Insert ``chunks`` of row tuples into ``model``'s table.
+
+    The compiled Core ``insert()`` is run once per chunk as a driver-level
+    executemany. Secondary indexes are dropped for the load and rebuilt
+    afterwards, which is several times faster than updating them row by row.
+    """
+    table = model.__table__
+    sql = str(table.insert().compile(connection, column_keys=COLUMNS[model]))
+    for index in table.indexes:
+        index.drop(connection)
+    for rows in chunks:
+        connection.exec_driver_sql(sql, rows)
+    for index in table.indexes:
+        index.create(connection)
+
+
+def recount_planets(connection):
+    """Recompute the planet counters from missions with one GROUP BY."""
+    counts = mission_aggregates().subquery()
+    connection.execute(update(Planet).values(mission_count=0, scientist_count=0))
+    connection.execute(
+        update(Planet)
+        .where(Planet.id == counts.c.planet_id)
+        .values(
+            mission_count=counts.c.mission_count,
+            scientist_count=counts.c.scientist_count,
+        )
+    )
 
-    return scientists
 
+def seed_db(planets=50, scientists=100, missions=150, seed=0,
+            chunk_size=10000, workers=0):
+    pool = ProcessPoolExecutor(workers) if workers else None
+    connection = db.session.connection()
+    try:
+        # Per-row counter and search triggers are dropped for the load; the
+        # counters and the search index are rebuilt in one pass at the end.
+        triggers = {**MISSION_COUNTER_TRIGGERS, **SCIENTIST_SEARCH_TRIGGERS}
+        for name in triggers:
+            connection.exec_driver_sql(f"DROP TRIGGER IF EXISTS {name}")
 
-def create_missions(planets, scientists):
-    missions = []
-    for _ in range(150):
-        m = Mission(
-            name=fake.sentence(nb_words=3),
-            planet_id=rc(planets).id,
-            scientist_id=rc(scientists).id,
+        print("Clearing db...")
+        connection.execute(delete(Mission))
+        connection.execute(delete(Scientist))
+        connection.execute(delete(Planet))
+
+        print(f"Seeding {planets} planets...")
+        load(
+            connection, Planet,
+            generate(pool, planet_rows, planets, chunk_size, seed),
         )
-        missions.append(m)
-    return missions
 
+        print(f"Seeding {scientists} scientists...")
+        seen = set()
+        load(
+            connection, Scientist,
+            (
+                unique_names(rows, seen)
+                for rows in generate(
+                    pool, scientist_rows, scientists, chunk_size, seed
+                )
+            ),
+        )
 
-if __name__ == "__main__":
-    with app.app_context():
-        print("Clearing db...")
-        Planet.query.delete()
-        Scientist.query.delete()
-        Mission.query.delete()
-
-        print("Seeding planets...")
-        planets = create_planets()
-        db.session.add_all(planets)
-        db.session.commit()
+        print(f"Seeding {missions} missions...")
+        load(
+            connection, Mission,
+            generate(
+                pool, mission_rows, missions, chunk_size,
+                seed, scientists, planets,
+            ),
+        )
 
-        print("Seeding scientists...")
-        scientists = create_scientists()
-        db.session.add_all(scientists)
+        for trigger in triggers.values():
+            connection.execute(DDL(trigger))
+        recount_planets(connection)
+        connection.exec_driver_sql(REBUILD_SCIENTIST_SEARCH)
         db.session.commit()
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    print("Done seeding!")
 
-        print("Seeding missions...")
-        missions = create_missions(planets, scientists)
-        db.session.add_all(missions)
-        db.session.commit()
 
-        print("Done seeding!")
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Seed the database.")
+    parser.add_argument("--planets", type=int, default=50)
+    parser.add_argument("--scientists", type=int, default=100)
+    parser.add_argument("--missions", type=int, default=150)
+    parser.add_argument("--seed", type=int, default=0,
+                        help="Faker/random seed; the same seed gives the same rows")
+    parser.add_argument("--chunk-size", type=int, default=10000,
+                        help="rows per insert batch")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="generate chunks in this many processes")
+    args = parser.parse_args()
+
+    with create_app().app_context():
+        seed_db(
+            planets=args.planets,
+            scientists=args.scientists,
+            missions=args.missions,
+            seed=args.seed,
+            chunk_size=args.chunk_size,
+            workers=args.workers,
+        )
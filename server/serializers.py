@@ -0,0 +1,76 @@
+"""Flat serializers compiled from each model's ``serialize_only``.
+
+``SerializerMixin.to_dict`` walks its rules and inspects every attribute on
+each call. Every field our models expose is a plain column, so the same
+dict can be built by zipping a row against a key tuple worked out once here.
+"""
+
+from sqlalchemy import select
+
+from models import Planet, Scientist, Mission
+
+
+class RowSerializer:
+    """Serialize rows of ``model`` using its ``serialize_only`` columns.
+
+    ``extra`` appends further column names after ``serialize_only``; ``only``
+    keeps just those of the resulting keys.
+    """
+
+    def __init__(self, model, extra=(), only=None):
+        table = model.__table__
+        keys = tuple(model.serialize_only) + tuple(extra)
+        if only is not None:
+            keys = tuple(key for key in keys if key in only)
+        for key in keys:
+            if key not in table.c:
+                raise TypeError(
+                    f"{model.__name__}.{key} is not a column and cannot be "
+                    "serialized from a row"
+                )
+        self.model = model
+        self.extra = tuple(extra)
+        self.keys = keys
+        self.columns = tuple(getattr(model, key) for key in self.keys)
+        self._subsets = {}
+
+    def only(self, fields):
+        """A serializer for just ``fields`` of :attr:`keys`, for ``?fields=``.
+
+        ``id`` is always kept so rows can still be paged and referenced.
+        Subsets are built once and reused. Raises ``ValueError`` on fields
+        this serializer does not have.
+        """
+        fields = frozenset(fields) | {"id"}
+        subset = self._subsets.get(fields)
+        if subset is None:
+            unknown = fields.difference(self.keys)
+            if unknown:
+                raise ValueError(f"Invalid fields: {', '.join(sorted(unknown))}")
+            subset = RowSerializer(self.model, self.extra, only=fields)
+            self._subsets[fields] = subset
+        return subset
+
+    def select(self):
+        """A ``select()`` of exactly the serialized columns, in key order."""
+        return select(*self.columns)
+
+    def row(self, row):
+        """Serialize a column tuple produced by :meth:`select`."""
+        return dict(zip(self.keys, row))
+
+    def rows(self, rows):
+        keys = self.keys
+        return [dict(zip(keys, row)) for row in rows]
+
+    def obj(self, obj):
+        """Serialize an already-loaded ORM instance."""
+        return {key: getattr(obj, key) for key in self.keys}
+
+
+planet_serializer = RowSerializer(Planet)
+planet_counts_serializer = RowSerializer(
+    Planet, extra=("mission_count", "scientist_count")
+)
+scientist_serializer = RowSerializer(Scientist)
+mission_serializer = RowSerializer(Mission)
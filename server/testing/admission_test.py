@@ -0,0 +1,99 @@
+import threading
+
+import pytest
+
+from admission import Limiter, Overloaded
+from models import db, Scientist
+
+
+@pytest.fixture
+def limited_app(make_app):
+    app = make_app(
+        ADMISSION_LIMITS={
+            "scientists": {"concurrency": 1},
+            "export": {"concurrency": 1},
+        },
+        ADMISSION_TIMEOUT=0.5,
+    )
+    with app.app_context():
+        db.session.add(Scientist(name="Little Law", field_of_study="queueing"))
+        db.session.commit()
+    return app
+
+
+class TestAdmission:
+    """Admission control in admission.py"""
+
+    def test_queues_then_sheds(self):
+        """queues requests up to its queue size and sheds the rest."""
+        limiter = Limiter(concurrency=1, queue=1, timeout=5)
+        limiter.acquire()
+        waiter = threading.Thread(target=limiter.acquire)
+        waiter.start()
+        while limiter.waiting == 0:
+            pass
+
+        with pytest.raises(Overloaded):
+            limiter.acquire()
+        limiter.release()
+        waiter.join()
+        assert limiter.stats() == {
+            "concurrency": 1, "queue": 1, "active": 1, "waiting": 0,
+            "admitted": 2, "shed": 1,
+        }
+
+    def test_sheds_after_timeout(self):
+        """gives up on a queued request after the timeout."""
+        limiter = Limiter(concurrency=1, queue=1, timeout=0.01)
+        limiter.acquire()
+        with pytest.raises(Overloaded):
+            limiter.acquire()
+        assert limiter.waiting == 0
+        assert limiter.shed == 1
+
+    def test_fails_fast_without_blocking_point_lookups(self, limited_app):
+        """returns 503 for a saturated list while lookups and writes still run."""
+        client = limited_app.test_client()
+        limiter = limited_app.extensions["admission"]["scientists"]
+        limiter.acquire()
+        try:
+            busy = client.get("/scientists")
+            assert busy.status_code == 503
+            assert busy.headers["Retry-After"] == "1"
+            assert client.get("/scientists/1").status_code == 200
+            assert client.post(
+                "/scientists", json={"name": "Erlang", "field_of_study": "queueing"}
+            ).status_code == 201
+        finally:
+            limiter.release()
+
+        assert client.get("/scientists").status_code == 200
+        stats = client.get("/admission/stats").json["scientists"]
+        assert stats["shed"] == 1
+        assert stats["admitted"] == 2
+        assert stats["active"] == 0
+
+    def test_serves_revalidations_while_saturated(self, limited_app):
+        """still answers If-None-Match hits when the list is saturated."""
+        client = limited_app.test_client()
+        etag = client.get("/scientists").headers["ETag"]
+        limiter = limited_app.extensions["admission"]["scientists"]
+        limiter.acquire()
+        try:
+            cached = client.get("/scientists", headers={"If-None-Match": etag})
+            assert cached.status_code == 304
+            assert client.get("/scientists").status_code == 503
+        finally:
+            limiter.release()
+        assert limiter.shed == 1
+
+    def test_holds_a_slot_while_streaming(self, limited_app):
+        """keeps an export's slot until its stream is closed."""
+        client = limited_app.test_client()
+        limiter = limited_app.extensions["admission"]["export"]
+
+        streaming = client.get("/export/scientists", buffered=False)
+        assert limiter.active == 1
+        assert client.get("/export/scientists").status_code == 503
+        streaming.close()
+        assert limiter.active == 0
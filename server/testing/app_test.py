@@ -1,10 +1,12 @@
 import json
 import os
+import time
 
 os.environ["DB_URI"] = "sqlite:///:memory:"
 
 from flask import request
 import ipdb
+from sqlalchemy import event
 from app import app, db
 from models import Planet, Scientist, Mission
 
@@ -51,6 +53,162 @@ class TestApp:
             ).delete()
             db.session.commit()
 
+    def test_pages_scientists_with_cursor(self):
+        """pages through scientists with ?limit=&after= on GET /scientists."""
+
+        with app.app_context():
+            scientists = [
+                Scientist(name=f"Pager {i}", field_of_study="paging")
+                for i in range(5)
+            ]
+            db.session.add_all(scientists)
+            db.session.commit()
+            ids = [s.id for s in Scientist.query.order_by(Scientist.id)]
+
+            client = app.test_client()
+            seen = []
+            after = ""
+            while True:
+                response = client.get(
+                    f"/scientists?limit=2&after={after}"
+                ).json
+                assert len(response["scientists"]) <= 2
+                seen += [s["id"] for s in response["scientists"]]
+                if response["next"] is None:
+                    break
+                after = response["next"]
+            assert seen == ids
+
+            assert client.get("/scientists?limit=0").status_code == 400
+            assert client.get("/scientists?limit=abc").status_code == 400
+
+            Scientist.query.filter(
+                Scientist.field_of_study == "paging"
+            ).delete()
+            db.session.commit()
+
+    def test_rejects_ids_sqlite_cannot_store(self):
+        """returns 400 for ids and cursors past SQLite's 64-bit range."""
+
+        with app.app_context():
+            client = app.test_client()
+            huge = 2**63
+
+            assert client.get(
+                f"/scientists?limit=2&after={huge}"
+            ).status_code == 400
+            assert client.get(
+                f"/scientists?limit=2&after={huge - 1}"
+            ).status_code == 200
+            for url in ("/scientists", "/planets"):
+                response = client.get(f"{url}/{huge}")
+                assert response.status_code == 400
+                assert response.json == {"error": "400: Validation error"}
+
+    def test_selects_only_requested_fields(self):
+        """returns and reads only ?fields= columns on list endpoints."""
+
+        with app.app_context():
+            sparse = Scientist(
+                name="Sparse Sue", field_of_study="fieldsets", avatar="a" * 200
+            )
+            db.session.add(sparse)
+            db.session.commit()
+            mission = Mission(name="thin", scientist_id=sparse.id, planet_id=1)
+            db.session.add(mission)
+            db.session.commit()
+            client = app.test_client()
+
+            statements = []
+            listener = lambda *args: statements.append(args[2])
+            event.listen(db.engine, "before_cursor_execute", listener)
+            try:
+                listed = client.get("/scientists?fields=name").json
+                included = client.get(
+                    "/scientists?fields=name&include=missions&limit=1000"
+                ).json["scientists"]
+            finally:
+                event.remove(db.engine, "before_cursor_execute", listener)
+            assert {"id": sparse.id, "name": "Sparse Sue"} in listed
+            assert all(set(s) == {"id", "name"} for s in listed)
+            assert all(set(s) == {"id", "name", "missions"} for s in included)
+            scientist_selects = [
+                s for s in statements if s.startswith("SELECT scientists.")
+            ]
+            assert len(scientist_selects) == 2
+            assert not [s for s in scientist_selects if "avatar" in s]
+
+            planets = [
+                Planet(name=f"Sparse {i}", distance_from_earth=2 * 10**12 + i)
+                for i in range(2)
+            ]
+            db.session.add_all(planets)
+            db.session.commit()
+            url = "/planets?fields=name&sort=distance&min_distance=2000000000000"
+            first = client.get(f"{url}&limit=1").json
+            second = client.get(f"{url}&limit=1&after={first['next']}").json
+            assert first["planets"] + second["planets"] == [
+                {"id": p.id, "name": p.name} for p in planets
+            ]
+
+            exported = client.get("/export/missions?fields=name").data
+            assert json.loads(exported.splitlines()[-1]) == {
+                "id": mission.id, "name": "thin"
+            }
+
+            assert client.get("/scientists?fields=name,planet").status_code == 400
+            assert client.get("/planets?fields=").status_code == 400
+            assert client.get("/export/planets?fields=avatar").status_code == 400
+
+            db.session.delete(mission)
+            for planet in planets:
+                db.session.delete(planet)
+            db.session.commit()
+            client.delete(f"/scientists/{sparse.id}")
+
+    def test_searches_scientists(self):
+        """ranks full-text matches for GET /scientists?q= and pages them."""
+
+        with app.app_context():
+            scientists = [
+                Scientist(name="Vera Rubin", field_of_study="galaxy rotation"),
+                Scientist(name="Henrietta Leavitt", field_of_study="variable stars"),
+                Scientist(name="Rubin Galaxyson", field_of_study="stellar galaxies"),
+                Scientist(name="Cecilia Payne", field_of_study="stellar composition"),
+            ]
+            db.session.add_all(scientists)
+            db.session.commit()
+            client = app.test_client()
+
+            names = lambda q: [s["name"] for s in client.get(f"/scientists?q={q}").json]
+            # A hit on the name outranks one on the field of study.
+            assert names("galax") == ["Rubin Galaxyson", "Vera Rubin"]
+            assert names("rubin rotation") == ["Vera Rubin"]
+            assert sorted(names("STELLAR")) == ["Cecilia Payne", "Rubin Galaxyson"]
+            assert names('"stars" OR NEAR(') == []
+            assert client.get("/scientists?q=%20!").status_code == 400
+
+            seen, after = [], ""
+            while True:
+                page = client.get(
+                    f"/scientists?q=stellar galax rubin&limit=1&after={after}"
+                ).json
+                seen += [s["name"] for s in page["scientists"]]
+                after = page["next"]
+                if after is None:
+                    break
+            assert seen == names("stellar galax rubin")
+
+            ids = {s.id for s in scientists}
+            leavitt = scientists[1]
+            leavitt.field_of_study = "cepheid variables"
+            db.session.commit()
+            assert names("cepheid") == ["Henrietta Leavitt"]
+            assert names("stars") == []
+
+            app.test_client().delete(f"/scientists?ids={','.join(map(str, ids))}")
+            assert names("stellar") == []
+
     def test_gets_scientists_by_id(self):
         """retrieves one scientist using its ID with GET request to /scientists/<int:id>."""
 
@@ -75,6 +233,115 @@ class TestApp:
             ).delete()
             db.session.commit()
 
+    def test_gets_scientist_missions_in_fixed_queries(self):
+        """loads a scientist's missions and planets without N+1 queries."""
+
+        with app.app_context():
+            scientist = Scientist(name="Vera Rubin", field_of_study="galaxies")
+            planets = [
+                Planet(name=f"Rubin {i}", distance_from_earth="1")
+                for i in range(3)
+            ]
+            db.session.add_all([scientist, *planets])
+            db.session.commit()
+            missions = [
+                Mission(
+                    name=f"survey {p.id}",
+                    scientist_id=scientist.id,
+                    planet_id=p.id,
+                )
+                for p in planets
+            ]
+            db.session.add_all(missions)
+            db.session.commit()
+
+            scientist_id = scientist.id
+            planet_ids = [p.id for p in planets]
+            statements = []
+
+            def count(conn, cursor, statement, *args):
+                statements.append(statement)
+
+            event.listen(db.engine, "before_cursor_execute", count)
+            try:
+                response = app.test_client().get(
+                    f"/scientists/{scientist_id}"
+                ).json
+            finally:
+                event.remove(db.engine, "before_cursor_execute", count)
+
+            assert len(statements) == 3
+            assert [
+                m["planet"]["id"] for m in response["missions"]
+            ] == planet_ids
+
+            response = app.test_client().get(
+                "/scientists?include=missions"
+            ).json
+            embedded = [s for s in response if s["id"] == scientist_id][0]
+            assert len(embedded["missions"]) == 3
+            assert "planet" not in embedded["missions"][0]
+
+            for m in missions:
+                db.session.delete(m)
+            db.session.commit()
+            for o in [scientist, *planets]:
+                db.session.delete(o)
+            db.session.commit()
+
+    def test_exports_scientists_as_ndjson(self):
+        """streams every scientist as one JSON line from /export/scientists."""
+
+        with app.app_context():
+            scientists = [
+                Scientist(name=f"Exporter {i}", field_of_study="exporting")
+                for i in range(3)
+            ]
+            db.session.add_all(scientists)
+            db.session.commit()
+
+            response = app.test_client().get("/export/scientists")
+            assert response.mimetype == "application/x-ndjson"
+            lines = [json.loads(l) for l in response.data.splitlines()]
+            assert [l["id"] for l in lines] == [
+                s.id for s in Scientist.query.order_by(Scientist.id)
+            ]
+            assert app.test_client().get("/export/nope").status_code == 404
+
+            Scientist.query.filter(
+                Scientist.field_of_study == "exporting"
+            ).delete()
+            db.session.commit()
+
+    def test_revalidates_scientists_with_etags(self):
+        """returns 304 for an unchanged ETag and a new ETag after a write."""
+
+        with app.app_context():
+            client = app.test_client()
+            first = client.get("/scientists")
+            etag = first.headers["ETag"]
+
+            cached = client.get("/scientists", headers={"If-None-Match": etag})
+            assert cached.status_code == 304
+            assert cached.data == b""
+
+            created = client.post(
+                "/scientists",
+                json={"name": "Edwin Hubble", "field_of_study": "cosmology"},
+            ).json
+            fresh = client.get("/scientists", headers={"If-None-Match": etag})
+            assert fresh.status_code == 200
+            assert fresh.headers["ETag"] != etag
+            assert created["id"] in [s["id"] for s in fresh.json]
+
+            detail = client.get(f"/scientists/{created['id']}")
+            assert client.get(
+                f"/scientists/{created['id']}",
+                headers={"If-None-Match": detail.headers["ETag"]},
+            ).status_code == 304
+
+            client.delete(f"/scientists/{created['id']}")
+
     def test_returns_404_if_no_scientist(self):
         """returns an error message and 404 status code when a scientist is searched by a non-existent ID."""
 
@@ -126,6 +393,34 @@ class TestApp:
             assert response.status_code == 400
             assert response.json["error"]
 
+    def test_400_lists_every_scientist_error(self):
+        """reports all field errors and duplicate names before inserting on POST /scientists."""
+
+        with app.app_context():
+            client = app.test_client()
+            response = client.post(
+                "/scientists", json={"name": "", "field_of_study": ""}
+            )
+            assert response.status_code == 400
+            assert response.json["errors"] == ["Invalid name", "Invalid field"]
+
+            body = {"name": "Bruce Banner", "field_of_study": "gamma rays"}
+            created = client.post("/scientists", json=body)
+            assert created.status_code == 201
+
+            statements = []
+            listener = lambda *args: statements.append(args[2])
+            event.listen(db.engine, "before_cursor_execute", listener)
+            try:
+                duplicate = client.post("/scientists", json=body)
+            finally:
+                event.remove(db.engine, "before_cursor_execute", listener)
+            assert duplicate.status_code == 400
+            assert duplicate.json["errors"] == ["Duplicate name"]
+            assert not [s for s in statements if s.startswith("INSERT")]
+
+            client.delete(f"/scientists/{created.json['id']}")
+
     def test_updates_scientist(self):
         """updates scientist with PATCH request to /scientists/<int:id>"""
 
@@ -156,6 +451,55 @@ class TestApp:
             Scientist.query.delete()
             db.session.commit()
 
+    def test_patches_scientist_with_version_check(self):
+        """updates with one statement on PATCH /scientists/<int:id> and 409s on a stale version."""
+
+        with app.app_context():
+            mj = Scientist(name="Mary Jane", field_of_study="theatre")
+            db.session.add(mj)
+            db.session.commit()
+            id = mj.id
+            client = app.test_client()
+            assert client.get(f"/scientists/{id}").json["version"] == 1
+
+            statements = []
+            listener = lambda *args: statements.append(args[2])
+            event.listen(db.engine, "before_cursor_execute", listener)
+            try:
+                response = client.patch(
+                    f"/scientists/{id}",
+                    json={"field_of_study": "photography", "version": 1},
+                )
+            finally:
+                event.remove(db.engine, "before_cursor_execute", listener)
+            assert response.status_code == 202
+            assert response.json["version"] == 2
+            assert len(statements) == 1
+            assert statements[0].startswith("UPDATE scientists")
+
+            stale = client.patch(
+                f"/scientists/{id}", json={"name": "MJ", "version": 1}
+            )
+            assert stale.status_code == 409
+            detail = client.get(f"/scientists/{id}").json
+            assert detail["name"] == "Mary Jane"
+            assert detail["field_of_study"] == "photography"
+
+            for body in (
+                {"field_of_study": ""},
+                {"planet": "Mars"},
+                {"name": "MJ", "version": "2"},
+                {"name": "MJ", "version": 2**63},
+                {},
+                [],
+            ):
+                assert client.patch(f"/scientists/{id}", json=body).status_code == 400
+            assert client.patch(
+                "/scientists/999999", json={"name": "Nobody"}
+            ).status_code == 404
+
+            client.delete(f"/scientists/{id}")
+
     def test_deletes_scientist_by_id(self):
         """deletes scientist with DELETE request to /scientists/<int:id>."""
 
@@ -193,6 +537,49 @@ class TestApp:
             ).one_or_none()
             assert not scientist
 
+    def test_deletes_scientists_in_bulk(self):
+        """deletes many scientists and their missions with DELETE /scientists?ids=."""
+
+        with app.app_context():
+            scientists = [
+                Scientist(name=f"Doomed {i}", field_of_study="deleting")
+                for i in range(3)
+            ]
+            pluto = Planet(name="Pluto", distance_from_earth="5000")
+            db.session.add_all([*scientists, pluto])
+            db.session.commit()
+            ids = [s.id for s in scientists]
+            db.session.add_all(
+                [
+                    Mission(name="last trip", scientist_id=id, planet_id=pluto.id)
+                    for id in ids
+                ]
+            )
+            db.session.commit()
+
+            response = app.test_client().delete(
+                f"/scientists?ids={','.join(str(id) for id in ids[:2])}"
+            )
+            assert response.json == {"deleted": 2}
+            assert [s.id for s in Scientist.query.filter(
+                Scientist.id.in_(ids)
+            )] == ids[2:]
+            assert [m.scientist_id for m in Mission.query.filter(
+                Mission.planet_id == pluto.id
+            )] == ids[2:]
+            assert app.test_client().delete("/scientists?ids=x").status_code == 400
+            assert app.test_client().delete(
+                f"/scientists?ids={ids[2]},{2**63}"
+            ).status_code == 400
+            too_many = ",".join(str(id) for id in range(1, 100_002))
+            assert app.test_client().delete(
+                f"/scientists?ids={too_many}"
+            ).status_code == 400
+
+            app.test_client().delete(f"/scientists/{ids[2]}")
+            db.session.delete(pluto)
+            db.session.commit()
+
     def test_gets_planets(self):
         """retrieves planets with GET request to /planets"""
 
@@ -225,6 +612,118 @@ class TestApp:
                 planet.image for planet in planets
             ]
 
+    def test_filters_and_sorts_planets_by_distance(self):
+        """filters GET /planets by distance range and pages it by distance."""
+
+        with app.app_context():
+            planets = [
+                Planet(name=name, distance_from_earth=distance)
+                for name, distance in [
+                    ("Far", 10**12 + 9), ("Near", 10**12 + 1),
+                    ("Mid", 10**12 + 5), ("Mid Twin", 10**12 + 5),
+                    ("Unknown", None),
+                ]
+            ]
+            db.session.add_all(planets)
+            db.session.commit()
+            client = app.test_client()
+
+            names = [
+                p["name"] for p in client.get(
+                    "/planets?sort=distance&min_distance=1000000000001"
+                    "&max_distance=1000000000009"
+                ).json
+            ]
+            assert names == ["Near", "Mid", "Mid Twin", "Far"]
+
+            seen, after = [], ""
+            while True:
+                page = client.get(
+                    "/planets?sort=distance&min_distance=1000000000000&limit=3"
+                    f"&after={after}"
+                ).json
+                seen += [p["name"] for p in page["planets"]]
+                after = page["next"]
+                if after is None:
+                    break
+            assert seen == names
+
+            assert client.get("/planets?sort=name").status_code == 400
+            assert client.get("/planets?min_distance=far").status_code == 400
+            assert client.get(
+                f"/planets?min_distance={2**63}"
+            ).status_code == 400
+            assert client.get(
+                f"/planets?max_distance={-2**63 - 1}"
+            ).status_code == 400
+            assert client.get(
+                f"/planets?sort=distance&limit=2&after={2**63}:1"
+            ).status_code == 400
+            assert client.get(
+                "/planets?sort=distance&limit=2&after=12"
+            ).status_code == 400
+
+            for planet in planets:
+                db.session.delete(planet)
+            db.session.commit()
+
+    def test_counts_planet_missions_and_scientists(self):
+        """keeps planet mission and scientist counts current on GET /planets/<int:id>."""
+
+        with app.app_context():
+            jupiter = Planet(name="Jupiter", distance_from_earth="600")
+            io = Planet(name="Io", distance_from_earth="601")
+            scientists = [
+                Scientist(name=f"Galileo {i}", field_of_study="moons")
+                for i in range(2)
+            ]
+            db.session.add_all([jupiter, io, *scientists])
+            db.session.commit()
+            a, b = [s.id for s in scientists]
+            client = app.test_client()
+
+            assert client.get(f"/planets/{jupiter.id}").json == {
+                "id": jupiter.id,
+                "name": "Jupiter",
+                "distance_from_earth": 600,
+                "nearest_star": None,
+                "image": None,
+                "mission_count": 0,
+                "scientist_count": 0,
+            }
+
+            client.post(
+                "/missions",
+                json=[
+                    {"name": "flyby", "scientist_id": a, "planet_id": jupiter.id},
+                    {"name": "orbit", "scientist_id": a, "planet_id": jupiter.id},
+                    {"name": "probe", "scientist_id": b, "planet_id": jupiter.id},
+                ],
+            )
+            counts = lambda id: {
+                k: v for k, v in client.get(f"/planets/{id}").json.items()
+                if k.endswith("_count")
+            }
+            assert counts(jupiter.id) == {"mission_count": 3, "scientist_count": 2}
+
+            probe = Mission.query.filter(Mission.name == "probe").one()
+            probe.planet_id = io.id
+            db.session.commit()
+            assert counts(jupiter.id) == {"mission_count": 2, "scientist_count": 1}
+            assert counts(io.id) == {"mission_count": 1, "scientist_count": 1}
+
+            client.delete(f"/scientists/{a}")
+            assert counts(jupiter.id) == {"mission_count": 0, "scientist_count": 0}
+
+            listed = {p["id"]: p for p in client.get("/planets").json}
+            assert listed[io.id]["mission_count"] == 1
+            assert client.get("/planets/999999").status_code == 404
+
+            client.delete(f"/scientists/{b}")
+            db.session.delete(jupiter)
+            db.session.delete(io)
+            db.session.commit()
+
     # def test_returns_404_if_no_planet(self):
     #     """returns 404 status code with DELETE request to /planets/<int:id> if planet does not exist."""
 
@@ -283,3 +782,80 @@ class TestApp:
                 Mission.id == response["id"]
             ).delete()
             db.session.commit()
+
+    def test_creates_missions_in_bulk(self):
+        """creates a list of missions in one POST request to /missions"""
+
+        with app.app_context():
+            curie = Scientist(name="Marie Curie", field_of_study="radiation")
+            venus = Planet(name="Venus", distance_from_earth="40")
+            db.session.add_all([curie, venus])
+            db.session.commit()
+
+            response = app.test_client().post(
+                "/missions",
+                json=[
+                    {
+                        "name": f"Venus probe {i}",
+                        "scientist_id": curie.id,
+                        "planet_id": venus.id,
+                    }
+                    for i in range(3)
+                ]
+                + [{"name": "", "scientist_id": curie.id, "planet_id": venus.id}]
+                + [{"name": "Too far", "scientist_id": 10**30, "planet_id": venus.id}],
+            )
+
+            assert response.status_code == 201
+            results = response.json
+            assert results[3] == {"errors": ["Invalid name"]}
+            assert results[4] == {"errors": ["Invalid scientist_id"]}
+            created = Mission.query.filter(
+                Mission.id.in_([r["id"] for r in results[:3]])
+            ).order_by(Mission.id).all()
+            assert [m.name for m in created] == [
+                f"Venus probe {i}" for i in range(3)
+            ]
+
+            for m in created:
+                db.session.delete(m)
+            db.session.delete(curie)
+            db.session.delete(venus)
+            db.session.commit()
+
+    def test_bulk_missions_to_one_pair_stay_linear(self):
+        """keeps bulk inserts for one scientist and planet from slowing as the pair fills."""
+
+        with app.app_context():
+            tycho = Scientist(name="Tycho Brahe", field_of_study="parallax")
+            mars = Planet(name="Mars", distance_from_earth="140")
+            db.session.add_all([tycho, mars])
+            db.session.commit()
+            client = app.test_client()
+
+            def post_batch(start):
+                began = time.perf_counter()
+                response = client.post("/missions", json=[
+                    {"name": f"Sighting {i}", "scientist_id": tycho.id,
+                     "planet_id": mars.id}
+                    for i in range(start, start + 3000)
+                ])
+                assert response.status_code == 201
+                return time.perf_counter() - began
+
+            first = post_batch(0)
+            post_batch(3000)
+            third = post_batch(6000)
+            # Counting the pair's missions on every insert made the third
+            # batch about five times slower than the first.
+            assert third < first * 2 + 0.1, (first, third)
+            db.session.expire_all()
+            assert db.session.get(Planet, mars.id).mission_count == 9000
+            assert db.session.get(Planet, mars.id).scientist_count == 1
+
+            db.session.execute(
+                db.delete(Mission).where(Mission.scientist_id == tycho.id)
+            )
+            db.session.delete(tycho)
+            db.session.delete(mars)
+            db.session.commit()
@@ -0,0 +1,102 @@
+import app as app_module
+from app import app
+from cache import MISSING, LRUCache, scientist_cache
+from models import db, Planet, Scientist, Mission
+
+
+class TestCache:
+    """LRU caches in cache.py"""
+
+    def test_evicts_least_recently_used(self):
+        """evicts the least recently used entry once full."""
+        cache = LRUCache(maxsize=2, ttl=60)
+        cache.set(1, "a")
+        cache.set(2, "b")
+        assert cache.get(1) == "a"
+        cache.set(3, "c")
+        assert cache.get(2) is MISSING
+        assert cache.get(1) == "a"
+        assert cache.stats()["evictions"] == 1
+        assert cache.stats()["hits"] == 2
+        assert cache.stats()["misses"] == 1
+
+    def test_expires_entries(self):
+        """expires entries after their ttl."""
+        now = [0.0]
+        cache = LRUCache(maxsize=2, ttl=5, clock=lambda: now[0])
+        cache.set(1, "a")
+        now[0] = 4.9
+        assert cache.get(1) == "a"
+        now[0] = 5.0
+        assert cache.get(1) is MISSING
+
+    def test_invalidates_on_write(self):
+        """drops cached scientist details when the scientist or its missions change."""
+        with app.app_context():
+            scientist = Scientist(name="Carl Sagan", field_of_study="planets")
+            saturn = Planet(name="Saturn", distance_from_earth="1200")
+            db.session.add_all([scientist, saturn])
+            db.session.commit()
+            id = scientist.id
+            client = app.test_client()
+
+            client.get(f"/scientists/{id}")
+            hits = scientist_cache.hits
+            assert client.get(f"/scientists/{id}").json["missions"] == []
+            assert scientist_cache.hits == hits + 1
+
+            db.session.add(
+                Mission(name="rings", scientist_id=id, planet_id=saturn.id)
+            )
+            db.session.commit()
+            assert scientist_cache.get(id) is MISSING
+            response = client.get(f"/scientists/{id}").json
+            assert [m["name"] for m in response["missions"]] == ["rings"]
+
+            client.patch(f"/scientists/{id}", json={"field_of_study": "stars"})
+            assert client.get(f"/scientists/{id}").json["field_of_study"] == "stars"
+
+            client.delete(f"/scientists/{id}")
+            assert client.get(f"/scientists/{id}").status_code == 404
+            db.session.delete(saturn)
+            db.session.commit()
+
+    def test_drops_values_read_before_a_write(self, monkeypatch):
+        """does not cache a scientist read before a write that commits first."""
+        with app.app_context():
+            scientist = Scientist(name="Ole Romer", field_of_study="Old")
+            db.session.add(scientist)
+            db.session.commit()
+            id = scientist.id
+            client = app.test_client()
+            scientist_cache.invalidate(id)
+
+            serialize = app_module.scientist_dict
+
+            def patched_mid_read(*args, **kwargs):
+                # The GET has read the row; a PATCH commits before it caches.
+                data = serialize(*args, **kwargs)
+                monkeypatch.setattr(app_module, "scientist_dict", serialize)
+                client.patch(f"/scientists/{id}", json={"field_of_study": "New"})
+                return data
+
+            monkeypatch.setattr(app_module, "scientist_dict", patched_mid_read)
+            assert client.get(f"/scientists/{id}").json["field_of_study"] == "Old"
+            assert scientist_cache.get(id) is MISSING
+            after = client.get(f"/scientists/{id}")
+            assert after.json["field_of_study"] == "New"
+            assert client.get(
+                f"/scientists/{id}", headers={"If-None-Match": after.headers["ETag"]}
+            ).status_code == 304
+
+            client.delete(f"/scientists/{id}")
+
+    def test_generation_guards_set(self):
+        """discards a value whose generation predates an invalidation."""
+        cache = LRUCache()
+        generation = cache.generation()
+        cache.invalidate(2)
+        cache.set(1, "stale", generation)
+        assert cache.get(1) is MISSING
+        cache.set(1, "fresh", cache.generation())
+        assert cache.get(1) == "fresh"
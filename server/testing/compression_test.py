@@ -0,0 +1,119 @@
+import gzip
+import json
+
+import pytest
+from sqlalchemy import event
+
+from cache import compressed_cache
+from models import db, Scientist
+
+
+@pytest.fixture
+def compressed_app(make_app):
+    app = make_app(JSON_COMPACT=True, COMPRESS=True, COMPRESS_MIN_SIZE=200)
+    with app.app_context():
+        db.session.add_all(
+            Scientist(name=f"Gzip Gail {i}", field_of_study="entropy coding")
+            for i in range(20)
+        )
+        db.session.commit()
+    return app
+
+
+GZIP = {"Accept-Encoding": "gzip"}
+
+
+class TestCompression:
+    """Response compression in compression.py"""
+
+    def test_gzips_compact_json(self, compressed_app):
+        """gzips large JSON responses for clients that accept it."""
+        client = compressed_app.test_client()
+        response = client.get("/scientists", headers=GZIP)
+        assert response.headers["Content-Encoding"] == "gzip"
+        assert "Accept-Encoding" in response.headers["Vary"]
+        assert response.headers["ETag"].endswith('-gzip"')
+
+        body = gzip.decompress(response.data)
+        assert len(response.data) < len(body)
+        assert b", " not in body and b": " not in body
+        assert len(json.loads(body)) == 20
+
+        plain = client.get("/scientists")
+        assert "Content-Encoding" not in plain.headers
+        assert json.loads(plain.data) == json.loads(body)
+
+    def test_leaves_small_responses_alone(self, compressed_app):
+        """does not compress responses below COMPRESS_MIN_SIZE."""
+        response = compressed_app.test_client().get("/scientists/1", headers=GZIP)
+        assert response.status_code == 200
+        assert "Content-Encoding" not in response.headers
+        assert "Accept-Encoding" in response.headers["Vary"]
+        assert response.json["name"] == "Gzip Gail 0"
+
+    def test_serves_repeats_from_the_compressed_cache(self, compressed_app):
+        """answers a repeated request from the cache without querying."""
+        client = compressed_app.test_client()
+        first = client.get("/scientists", headers=GZIP)
+
+        with compressed_app.app_context():
+            statements = []
+            listener = lambda *args: statements.append(args[2])
+            event.listen(db.engine, "before_cursor_execute", listener)
+            try:
+                hits = compressed_cache.hits
+                again = client.get("/scientists", headers=GZIP)
+            finally:
+                event.remove(db.engine, "before_cursor_execute", listener)
+        assert compressed_cache.hits == hits + 1
+        assert statements == []
+        assert again.data == first.data
+        assert again.headers["ETag"] == first.headers["ETag"]
+
+    def test_keeps_urls_apart_in_the_compressed_cache(self, compressed_app):
+        """never serves one URL's cached body for another."""
+        client = compressed_app.test_client()
+        # These two paths have the same CRC32.
+        sparse = client.get(
+            "/scientists?fields=name&x=NL5Cj_mpQ3zx", headers=GZIP
+        )
+        full = client.get("/scientists?x=Za4o4qx7llOs", headers=GZIP)
+
+        assert sparse.headers["ETag"] != full.headers["ETag"]
+        assert set(json.loads(gzip.decompress(sparse.data))[0]) == {"id", "name"}
+        assert "field_of_study" in json.loads(gzip.decompress(full.data))[0]
+
+    def test_revalidates_encoded_etags(self, compressed_app):
+        """returns 304 for an unchanged encoded ETag and 200 after a write."""
+        client = compressed_app.test_client()
+        etag = client.get("/scientists", headers=GZIP).headers["ETag"]
+
+        cached = client.get("/scientists", headers={**GZIP, "If-None-Match": etag})
+        assert cached.status_code == 304
+        assert cached.headers["ETag"] == etag
+
+        client.post(
+            "/scientists", json={"name": "Huffman Hal", "field_of_study": "codes"}
+        )
+        fresh = client.get("/scientists", headers={**GZIP, "If-None-Match": etag})
+        assert fresh.status_code == 200
+        assert len(json.loads(gzip.decompress(fresh.data))) == 21
+
+    def test_gzips_streamed_exports(self, compressed_app):
+        """compresses streamed NDJSON exports chunk by chunk."""
+        response = compressed_app.test_client().get(
+            "/export/scientists", headers=GZIP
+        )
+        assert response.headers["Content-Encoding"] == "gzip"
+        lines = gzip.decompress(response.data).decode().splitlines()
+        assert len(lines) == 20
+        assert json.loads(lines[0])["name"] == "Gzip Gail 0"
+
+    def test_prefers_brotli(self, compressed_app):
+        """sends brotli when it is installed and the client accepts it."""
+        brotli = pytest.importorskip("brotli")
+        response = compressed_app.test_client().get(
+            "/scientists", headers={"Accept-Encoding": "gzip, br"}
+        )
+        assert response.headers["Content-Encoding"] == "br"
+        assert len(json.loads(brotli.decompress(response.data))) == 20
@@ -0,0 +1,33 @@
+from flask import Flask
+from sqlalchemy import text
+
+from config import get_config
+from models import db, init_db
+
+
+class TestConfig:
+    """Engine profiles in config.py"""
+
+    def test_production_profile_sets_pragmas(self, tmp_path):
+        """opens SQLite in WAL mode with the production pragmas."""
+        config = get_config("production")
+        production = Flask(__name__)
+        production.config.from_object(config)
+        production.config["SQLALCHEMY_DATABASE_URI"] = (
+            f"sqlite:///{tmp_path / 'production.db'}"
+        )
+        init_db(production)
+
+        with production.app_context():
+            pragma = lambda name: db.session.execute(
+                text(f"PRAGMA {name}")
+            ).scalar()
+            assert pragma("journal_mode") == "wal"
+            assert pragma("synchronous") == 1
+            assert pragma("busy_timeout") == config.SQLITE_PRAGMAS["busy_timeout"]
+            assert db.engine.pool.size() == config.SQLALCHEMY_ENGINE_OPTIONS["pool_size"]
+
+    def test_development_profile_keeps_defaults(self):
+        """leaves the development engine untouched."""
+        assert get_config("development").SQLITE_PRAGMAS == {}
+        assert get_config("development").SQLALCHEMY_ENGINE_OPTIONS == {}
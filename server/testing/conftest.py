@@ -1,9 +1,47 @@
 #!/usr/bin/env python3
 
+import os
+
+import pytest
+
+os.environ.setdefault("DB_URI", "sqlite:///:memory:")
+
+from app import app, create_app
+from config import TestingConfig
+from models import db
+
+with app.app_context():
+    db.create_all()
+
+
+@pytest.fixture
+def make_app():
+    """Build apps from TestingConfig with ``make_app(**overrides)``.
+
+    Each app gets its tables created; its engines are disposed after the
+    test.
+    """
+    apps = []
+
+    def make(**overrides):
+        app = create_app(type("Config", (TestingConfig,), overrides))
+        with app.app_context():
+            # Other apps' binds share the metadata; only create this one's.
+            db.create_all(bind_key=None)
+        apps.append(app)
+        return app
+
+    yield make
+    for app in apps:
+        with app.app_context():
+            for engine in db.engines.values():
+                engine.dispose()
+
+
 def pytest_itemcollected(item):
     par = item.parent.obj
     node = item.obj
     pref = par.__doc__.strip() if par.__doc__ else par.__class__.__name__
     suf = node.__doc__.strip() if node.__doc__ else node.__name__
     if pref or suf:
-        item._nodeid = ' '.join((pref, suf))
\ No newline at end of file
+        item._nodeid = ' '.join((pref, suf))
@@ -0,0 +1,42 @@
+from app import app
+from models import db, Scientist
+
+OK = 'route="/scientists/<int:id>",method="GET",status="200"'
+MISSING = 'route="/scientists/<int:id>",method="GET",status="404"'
+
+
+def sample(client, series):
+    for line in client.get("/metrics").get_data(as_text=True).splitlines():
+        if line.startswith(series + " "):
+            return float(line.rsplit(" ", 1)[1])
+    return 0.0
+
+
+class TestMetrics:
+    """Request metrics in metrics.py"""
+
+    def test_records_requests_and_queries(self):
+        """exposes per-route latency, DB time and query count on /metrics."""
+        with app.app_context():
+            scientist = Scientist(name="Henrietta Leavitt", field_of_study="stars")
+            db.session.add(scientist)
+            db.session.commit()
+            id = scientist.id
+            client = app.test_client()
+            ok = f"http_request_duration_seconds_count{{{OK}}}"
+            missing = f"http_request_duration_seconds_count{{{MISSING}}}"
+            # The scientist and its missions: at most two statements.
+            two_queries = f'http_request_queries_bucket{{{OK},le="2"}}'
+            one_query = f'http_request_queries_bucket{{{OK},le="1"}}'
+            before = [sample(client, s) for s in (ok, missing, two_queries, one_query)]
+
+            client.get(f"/scientists/{id}?include=missions")
+            client.get("/scientists/999999")
+
+            after = [sample(client, s) for s in (ok, missing, two_queries, one_query)]
+            assert [a - b for a, b in zip(after, before)] == [1, 1, 1, 0]
+            body = client.get("/metrics").get_data(as_text=True)
+            assert "# TYPE http_request_db_seconds histogram" in body
+
+            db.session.delete(scientist)
+            db.session.commit()
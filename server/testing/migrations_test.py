@@ -0,0 +1,85 @@
+import os
+
+import pytest
+from flask import Flask
+from flask_migrate import Migrate, upgrade
+from sqlalchemy import text
+
+from models import db
+
+MIGRATIONS = os.path.join(os.path.dirname(__file__), "..", "migrations")
+
+
+@pytest.fixture
+def migrated_db(tmp_path):
+    migrated = Flask(__name__)
+    migrated.config["SQLALCHEMY_DATABASE_URI"] = (
+        f"sqlite:///{tmp_path / 'migrated.db'}"
+    )
+    db.init_app(migrated)
+    Migrate(migrated, db, directory=MIGRATIONS)
+    with migrated.app_context():
+        upgrade()
+        yield db
+
+
+class TestMigrations:
+    """Alembic migrations in migrations/versions"""
+
+    @pytest.mark.parametrize(
+        "query",
+        [
+            "SELECT * FROM missions WHERE scientist_id = 1",
+            "SELECT * FROM missions WHERE planet_id = 1",
+            "SELECT planet_id FROM missions WHERE scientist_id = 1",
+            "DELETE FROM missions WHERE scientist_id IN (1, 2)",
+            "SELECT * FROM planets WHERE distance_from_earth BETWEEN 1 AND 9",
+            "SELECT * FROM planets ORDER BY distance_from_earth LIMIT 10",
+        ],
+    )
+    def test_lookups_use_indexes(self, migrated_db, query):
+        """looks up missions and planet distances without a full scan or sort."""
+        plan = migrated_db.session.execute(
+            text(f"EXPLAIN QUERY PLAN {query}")
+        ).all()
+        details = [row[-1] for row in plan]
+        assert not [
+            d for d in details
+            if d in ("SCAN missions", "SCAN planets") or "TEMP B-TREE" in d
+        ], details
+
+    def test_scientist_search_follows_writes(self, migrated_db):
+        """keeps the scientists_fts index in step with the scientists table."""
+        session = migrated_db.session
+        search = lambda q: session.execute(
+            text(
+                "SELECT rowid FROM scientists_fts "
+                "WHERE scientists_fts MATCH :q ORDER BY rank"
+            ),
+            {"q": q},
+        ).scalars().all()
+
+        session.execute(text(
+            "INSERT INTO scientists (id, name, field_of_study) "
+            "VALUES (1, 'Ada Lovelace', 'analytical engines')"
+        ))
+        assert search("engine*") == [1]
+        session.execute(text(
+            "UPDATE scientists SET field_of_study = 'poetry' WHERE id = 1"
+        ))
+        assert search("engine*") == []
+        session.execute(text("DELETE FROM scientists WHERE id = 1"))
+        assert search("ada") == []
+
+    def test_counter_triggers_match_the_models(self, migrated_db):
+        """creates the same mission counter triggers as models.py."""
+        from models import MISSION_COUNTER_TRIGGERS
+
+        migrated = dict(migrated_db.session.execute(text(
+            "SELECT name, sql FROM sqlite_master WHERE type = 'trigger' "
+            "AND name LIKE 'missions_counters_%'"
+        )).all())
+        normalize = lambda sql: " ".join(sql.split())
+        assert {name: normalize(sql) for name, sql in migrated.items()} == {
+            name: normalize(sql) for name, sql in MISSION_COUNTER_TRIGGERS.items()
+        }
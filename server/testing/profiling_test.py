@@ -0,0 +1,27 @@
+import os
+
+from app import app
+from profiling import endpoint_files, hot_functions
+
+
+class TestProfiling:
+    """Request profiler in profiling.py"""
+
+    def test_profiles_requests_with_secret_header(self, tmp_path):
+        """writes a .pstats file only for requests with the secret header."""
+        app.config.update(PROFILE_SECRET="s3cret", PROFILE_DIR=str(tmp_path))
+        try:
+            client = app.test_client()
+            client.get("/scientists")
+            client.get("/scientists", headers={"X-Profile": "wrong"})
+            assert os.listdir(tmp_path) == []
+
+            client.get("/scientists", headers={"X-Profile": "s3cret"})
+            client.get("/scientists/1", headers={"X-Profile": "s3cret"})
+        finally:
+            app.config.update(PROFILE_SECRET=None, PROFILE_DIR="profiles")
+
+        endpoints = endpoint_files(tmp_path)
+        assert sorted(endpoints) == ["GET scientists", "GET scientists_int_id"]
+        functions = [f for f, *_ in hot_functions(endpoints["GET scientists"], 50)]
+        assert any("app.py" in f and "(get)" in f for f in functions)
@@ -0,0 +1,63 @@
+import pytest
+from sqlalchemy.exc import OperationalError
+
+from cache import MISSING, scientist_cache
+from models import db, REPLICA, Scientist
+from replica import PRIMARY_COOKIE, snapshot
+
+
+@pytest.fixture
+def replica_app(tmp_path, make_app):
+    primary, copy = tmp_path / "app.db", tmp_path / "replica.db"
+    app = make_app(
+        SQLALCHEMY_DATABASE_URI=f"sqlite:///{primary}",
+        SQLALCHEMY_BINDS={REPLICA: f"sqlite:///{copy}"},
+    )
+    with app.app_context():
+        db.session.add(Scientist(name="Snapshot Sam", field_of_study="copies"))
+        db.session.commit()
+        snapshot(primary, copy)
+        # Pooled connections still see the file the snapshot replaced.
+        db.engines[REPLICA].dispose()
+    return app
+
+
+class TestReplica:
+    """Read replica routing in replica.py"""
+
+    def test_reads_from_replica_and_writers_read_their_writes(self, replica_app):
+        """serves GETs from the replica except to a client that just wrote."""
+        names = lambda client: [
+            s["name"] for s in client.get("/scientists").json
+        ]
+        writer, reader = replica_app.test_client(), replica_app.test_client()
+
+        created = writer.post(
+            "/scientists", json={"name": "Fresh Fran", "field_of_study": "writes"}
+        )
+        assert created.status_code == 201
+        assert writer.get_cookie(PRIMARY_COOKIE)
+
+        assert names(writer) == ["Snapshot Sam", "Fresh Fran"]
+        assert writer.get("/scientists").headers.get("ETag")
+        # The snapshot predates the write.
+        assert names(reader) == ["Snapshot Sam"]
+        assert reader.get("/scientists").headers.get("ETag") is None
+        id = created.json["id"]
+        assert reader.get(f"/scientists/{id}").status_code == 404
+
+    def test_replica_reads_skip_the_cache(self, replica_app):
+        """does not cache scientist details read from the replica."""
+        scientist_cache.clear()
+        client = replica_app.test_client()
+        with replica_app.app_context():
+            id = db.session.query(Scientist.id).scalar()
+        assert client.get(f"/scientists/{id}").json["name"] == "Snapshot Sam"
+        assert scientist_cache.get(id) is MISSING
+
+    def test_replica_is_read_only(self, replica_app):
+        """refuses writes on replica connections."""
+        with replica_app.app_context():
+            with db.engines[REPLICA].connect() as connection:
+                with pytest.raises(OperationalError):
+                    connection.exec_driver_sql("DELETE FROM scientists")
@@ -0,0 +1,87 @@
+import pytest
+from sqlalchemy import event
+
+from app import app
+from models import db, Scientist
+from schemas import ValidationError, mission_schema, scientist_schema
+
+
+def errors(schema, data, **kwargs):
+    with pytest.raises(ValidationError) as info:
+        schema.validate(data, **kwargs)
+    return info.value.errors
+
+
+class TestSchemas:
+    """Request schemas in schemas.py"""
+
+    def test_reports_every_error_at_once(self):
+        """collects unknown fields, bad types and validator messages together."""
+        assert errors(
+            scientist_schema,
+            {"name": "", "field_of_study": 7, "avatar": None, "planet": "Mars"},
+        ) == ["Unknown field planet", "Invalid name", "Invalid field_of_study"]
+        assert errors(mission_schema, {}) == [
+            "Invalid name", "Invalid scientist_id", "Invalid planet_id",
+        ]
+        assert errors(
+            mission_schema, {"name": "x", "scientist_id": True, "planet_id": "1"}
+        ) == ["Invalid scientist_id", "Invalid planet_id"]
+        assert errors(scientist_schema, ["Ada"]) == ["Invalid scientist"]
+
+    def test_rejects_integers_sqlite_cannot_store(self):
+        """rejects integers outside SQLite's signed 64-bit range."""
+        assert errors(
+            mission_schema,
+            {"name": "x", "scientist_id": 2**63, "planet_id": -2**63 - 1},
+        ) == ["Invalid scientist_id", "Invalid planet_id"]
+        assert mission_schema.validate(
+            {"name": "x", "scientist_id": 2**63 - 1, "planet_id": 1}
+        )["scientist_id"] == 2**63 - 1
+
+        with app.app_context():
+            response = app.test_client().post(
+                "/missions", json={"name": "x", "scientist_id": 10**30, "planet_id": 1}
+            )
+        assert response.status_code == 400
+        assert response.json["errors"] == ["Invalid scientist_id"]
+
+    def test_returns_values(self):
+        """returns the validated values, filling optional columns with None."""
+        assert scientist_schema.validate(
+            {"name": "Ada", "field_of_study": "engines"}
+        ) == {"name": "Ada", "field_of_study": "engines", "avatar": None}
+        assert scientist_schema.validate(
+            {"avatar": "ada.png"}, partial=True
+        ) == {"avatar": "ada.png"}
+        assert errors(scientist_schema, {"name": None}, partial=True) == [
+            "Invalid name"
+        ]
+
+    def test_checks_unique_names_with_one_query(self):
+        """finds a taken name with a single lookup on the unique index."""
+        with app.app_context():
+            ada = Scientist(name="Ada Unique", field_of_study="engines")
+            db.session.add(ada)
+            db.session.commit()
+
+            statements = []
+            listener = lambda *args: statements.append(args[2:4])
+            event.listen(db.engine, "before_cursor_execute", listener)
+            try:
+                assert scientist_schema.taken({"name": "Ada Unique"}) == [
+                    "Duplicate name"
+                ]
+                assert scientist_schema.taken({"name": "Ada Other"}) == []
+            finally:
+                event.remove(db.engine, "before_cursor_execute", listener)
+            assert len(statements) == 2
+
+            sql, parameters = statements[0]
+            plan = db.session.connection().exec_driver_sql(
+                f"EXPLAIN QUERY PLAN {sql}", parameters
+            ).all()
+            assert "INDEX" in plan[-1][-1]
+
+            db.session.delete(ada)
+            db.session.commit()
@@ -0,0 +1,27 @@
+from seed import mission_rows, scientist_rows, unique_names
+
+
+class TestSeed:
+    """Bulk seeder in seed.py"""
+
+    def test_rows_are_deterministic(self):
+        """generates the same rows for the same seed and chunk."""
+        assert scientist_rows(1, 50, seed=7) == scientist_rows(1, 50, seed=7)
+        assert scientist_rows(1, 50, seed=7) != scientist_rows(1, 50, seed=8)
+        assert mission_rows(51, 50, 7, 10, 5) == mission_rows(51, 50, 7, 10, 5)
+
+    def test_missions_reference_seeded_ids(self):
+        """points missions only at scientist and planet ids that exist."""
+        rows = mission_rows(1, 500, 0, scientists=10, planets=5)
+        assert [row[0] for row in rows] == list(range(1, 501))
+        assert {row[2] for row in rows} <= set(range(1, 11))
+        assert {row[3] for row in rows} <= set(range(1, 6))
+
+    def test_unique_names(self):
+        """suffixes repeated scientist names so they stay unique."""
+        seen = set()
+        rows = unique_names(
+            [(1, "Ada", "x", "a"), (2, "Ada", "x", "a")], seen
+        )
+        rows += unique_names([(3, "Ada", "x", "a")], seen)
+        assert [row[1] for row in rows] == ["Ada", "Ada 2", "Ada 3"]
@@ -0,0 +1,54 @@
+import pytest
+
+from app import app
+from models import db, Planet, Scientist, Mission
+from serializers import (
+    planet_serializer,
+    scientist_serializer,
+    mission_serializer,
+)
+
+
+class TestSerializers:
+    """Row serializers in serializers.py"""
+
+    def test_matches_to_dict(self):
+        """serializes rows and objects exactly like SerializerMixin.to_dict."""
+        with app.app_context():
+            scientist = Scientist(name="Ada Row", field_of_study="serializing")
+            planet = Planet(name="Rowland", distance_from_earth="7")
+            db.session.add_all([scientist, planet])
+            db.session.commit()
+            mission = Mission(
+                name="row trip", scientist_id=scientist.id, planet_id=planet.id
+            )
+            db.session.add(mission)
+            db.session.commit()
+
+            for serializer, obj in [
+                (scientist_serializer, scientist),
+                (planet_serializer, planet),
+                (mission_serializer, mission),
+            ]:
+                model = type(obj)
+                row = db.session.execute(
+                    serializer.select().where(model.id == obj.id)
+                ).one()
+                assert serializer.row(row) == obj.to_dict()
+                assert serializer.obj(obj) == obj.to_dict()
+
+            db.session.delete(mission)
+            db.session.commit()
+            db.session.delete(scientist)
+            db.session.delete(planet)
+            db.session.commit()
+
+    def test_only_selects_requested_fields(self):
+        """narrows keys and columns to the requested fields, always keeping id."""
+        subset = scientist_serializer.only({"name"})
+        assert subset.keys == ("id", "name")
+        assert [c.key for c in subset.columns] == ["id", "name"]
+        assert scientist_serializer.only(["name", "id"]) is subset
+        assert "avatar" not in str(subset.select())
+        with pytest.raises(ValueError):
+            scientist_serializer.only({"name", "planet"})
@@ -0,0 +1,109 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from app import create_app
+from config import TestingConfig
+from models import db
+
+SERVER = os.path.join(os.path.dirname(__file__), "..")
+FRAMEWORK = "flask, flask_sqlalchemy, flask_restful, flask_cors, sqlalchemy.orm"
+# Import time of our own modules on top of the frameworks, as reported by
+# ``python -X importtime``; generous so that slow machines stay green.
+STARTUP_BUDGET_MS = 250
+
+
+def import_times(code):
+    """Run ``code`` under ``-X importtime``; map module to cumulative µs."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=SERVER,
+        env=dict(os.environ, DB_URI="sqlite:///:memory:"),
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if line.startswith("import time:") and "|" in line:
+            _, cumulative, module = line.split("|")
+            if cumulative.strip().isdigit():
+                times[module.strip()] = int(cumulative)
+    return times
+
+
+class TestStartup:
+    """App factory in app.py"""
+
+    def test_startup_skips_migration_tooling(self):
+        """builds the app without importing Flask-Migrate or Alembic, within the startup budget."""
+        times = import_times(f"import {FRAMEWORK}; import app; app.create_app()")
+        assert "app" in times
+        assert not [m for m in times if m.split(".")[0] in ("alembic", "flask_migrate")]
+        assert times["app"] / 1000 < STARTUP_BUDGET_MS
+
+    def test_registers_migrations_only_when_asked(self):
+        """registers Flask-Migrate for the flask db commands only with MIGRATE."""
+
+        class MigrateConfig(TestingConfig):
+            MIGRATE = True
+
+        assert "migrate" not in create_app("testing").extensions
+        assert "migrate" in create_app(MigrateConfig).extensions
+
+    def test_creates_independent_apps(self):
+        """builds a separate app per create_app() call."""
+        first, second = create_app("testing"), create_app("testing")
+        assert first is not second
+        assert first.config["TESTING"]
+        assert "/scientists" in {rule.rule for rule in second.url_map.iter_rules()}
+
+    @pytest.mark.skipif(not hasattr(os, "fork"), reason="needs os.fork")
+    def test_forked_workers_get_fresh_connections(self):
+        """disposes the inherited connection pool in a forked child."""
+        app = create_app("testing")
+        with app.app_context():
+            engine = db.engine
+            db.session.execute(db.select(1))
+            db.session.remove()
+        parent_pool = engine.pool
+
+        pid = os.fork()
+        if pid == 0:
+            os._exit(0 if engine.pool is not parent_pool else 1)
+        _, status = os.waitpid(pid, 0)
+        assert os.waitstatus_to_exitcode(status) == 0
+        assert engine.pool is parent_pool
+
+    @pytest.mark.skipif(not hasattr(os, "fork"), reason="needs os.fork")
+    def test_forked_workers_share_etags(self, tmp_path):
+        """revalidates with a 200 after another forked worker writes."""
+
+        class SharedConfig(TestingConfig):
+            SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'app.db'}"
+
+        app = create_app(SharedConfig)
+        with app.app_context():
+            db.create_all(bind_key=None)
+        client = app.test_client()
+        tag = client.get("/scientists").headers["ETag"]
+        assert client.get(
+            "/scientists", headers={"If-None-Match": tag}
+        ).status_code == 304
+
+        pid = os.fork()
+        if pid == 0:
+            response = client.post(
+                "/scientists", json={"name": "Forked Fran", "field_of_study": "IPC"}
+            )
+            os._exit(0 if response.status_code == 201 else 1)
+        _, status = os.waitpid(pid, 0)
+        assert os.waitstatus_to_exitcode(status) == 0
+
+        response = client.get("/scientists", headers={"If-None-Match": tag})
+        assert response.status_code == 200
+        assert [s["name"] for s in response.json] == ["Forked Fran"]
+        with app.app_context():
+            db.engine.dispose()
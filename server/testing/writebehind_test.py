@@ -0,0 +1,108 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from models import db, Mission, Planet, Scientist
+
+
+@pytest.fixture
+def writer_app(tmp_path, make_app):
+    app = make_app(
+        SQLALCHEMY_DATABASE_URI=f"sqlite:///{tmp_path / 'app.db'}",
+        SQLITE_PRAGMAS={"foreign_keys": "ON"},
+        WRITE_BEHIND=True,
+        WRITE_BEHIND_WAIT_MS=50,
+    )
+    with app.app_context():
+        db.session.add_all([
+            Scientist(name="Batch Bea", field_of_study="queues"),
+            Planet(name="Fsync", distance_from_earth=1, nearest_star="Disk"),
+        ])
+        db.session.commit()
+    yield app
+    app.extensions["mission_writer"].close()
+
+
+def post_missions(app, bodies):
+    def post(body):
+        return app.test_client().post("/missions", json=body)
+
+    with ThreadPoolExecutor(len(bodies)) as pool:
+        return list(pool.map(post, bodies))
+
+
+class TestWriteBehind:
+    """Group commit queue in writebehind.py"""
+
+    def test_commits_concurrent_missions_in_batches(self, writer_app):
+        """commits concurrent missions together and returns each one's row."""
+        bodies = [
+            {"name": f"Batch {i}", "scientist_id": 1, "planet_id": 1}
+            for i in range(20)
+        ]
+        responses = post_missions(writer_app, bodies)
+
+        assert [r.status_code for r in responses] == [201] * 20
+        assert sorted(r.json["name"] for r in responses) == sorted(
+            body["name"] for body in bodies
+        )
+        assert len({r.json["id"] for r in responses}) == 20
+        stats = writer_app.extensions["mission_writer"].stats()
+        assert stats["rows"] == 20
+        assert stats["batches"] < 20
+        with writer_app.app_context():
+            assert db.session.query(Mission).count() == 20
+            assert db.session.get(Planet, 1).mission_count == 20
+
+    def test_rejects_only_the_invalid_rows_of_a_batch(self, writer_app):
+        """fails missions the database rejects without failing their batch."""
+        responses = post_missions(writer_app, [
+            {"name": "Good", "scientist_id": 1, "planet_id": 1},
+            {"name": "Orphan", "scientist_id": 1, "planet_id": 404},
+        ])
+
+        assert responses[0].status_code == 201
+        assert responses[1].status_code == 400
+        assert responses[1].json["errors"] == ["Invalid mission"]
+        with writer_app.app_context():
+            assert db.session.query(Mission.name).scalar() == "Good"
+
+    def test_validates_before_queueing(self, writer_app):
+        """returns validation errors without queueing the mission."""
+        response = writer_app.test_client().post(
+            "/missions", json={"name": "", "scientist_id": 1, "planet_id": 1}
+        )
+        assert response.status_code == 400
+        assert writer_app.extensions["mission_writer"].stats()["rows"] == 0
+
+    def test_sheds_missions_the_writer_cannot_take(self, writer_app, monkeypatch):
+        """returns 503 with Retry-After when the writer falls behind."""
+        writer = writer_app.extensions["mission_writer"]
+        started, release = threading.Event(), threading.Event()
+        write = writer._write
+
+        def blocked(batch):
+            started.set()
+            release.wait()
+            write(batch)
+
+        monkeypatch.setattr(writer, "_write", blocked)
+        first = threading.Thread(target=post_missions, args=(writer_app, [
+            {"name": "Stuck", "scientist_id": 1, "planet_id": 1},
+        ]))
+        first.start()
+        assert started.wait(5)
+
+        monkeypatch.setattr(writer, "timeout", 0.1)
+        shed = writer_app.test_client().post(
+            "/missions", json={"name": "Shed", "scientist_id": 1, "planet_id": 1}
+        )
+        release.set()
+        first.join()
+
+        assert shed.status_code == 503
+        assert shed.headers["Retry-After"] == "1"
+        assert writer.stats()["timeouts"] == 1
+        with writer_app.app_context():
+            assert db.session.query(Mission.name).all() == [("Stuck",)]
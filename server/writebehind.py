@@ -0,0 +1,206 @@
+"""Write-behind group commit for ``POST /missions``.
+
+With ``WRITE_BEHIND`` on, a validated mission is handed to the app's
+:class:`GroupCommitQueue` instead of being committed by the request. One
+background thread per process inserts queued missions in batches of up to
+``WRITE_BEHIND_BATCH`` rows, each batch in a single transaction, and starts
+a batch as soon as it is full or ``WRITE_BEHIND_WAIT_MS`` after its first
+row was queued. A request is released only once its batch has committed, so
+a 201 still means the row is durable, but the commit (and its fsync) is
+shared by everything that arrived in the meantime: the more concurrent
+writers, the larger the batches.
+
+A request waits at most ``WRITE_BEHIND_TIMEOUT`` seconds for the writer to
+pick its mission up; past that it is withdrawn from the queue and the
+request fails with :class:`QueueTimeout`, so a backlog sheds load instead
+of growing latency without bound.
+"""
+
+import os
+import queue
+import threading
+import time
+
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+
+from etags import bump
+from models import db, Mission
+from schemas import ValidationError
+from serializers import mission_serializer
+
+_STOP = object()
+
+
+class QueueTimeout(Exception):
+    """The writer did not take a queued mission within the timeout."""
+
+
+class _Pending:
+    __slots__ = ("values", "done", "taken", "withdrawn", "result", "error")
+
+    def __init__(self, values):
+        self.values = values
+        self.done = threading.Event()
+        self.taken = False
+        self.withdrawn = False
+        self.result = None
+        self.error = None
+
+    def resolve(self, result=None, error=None):
+        self.result, self.error = result, error
+        self.done.set()
+
+
+class GroupCommitQueue:
+    """Insert missions for ``app`` in batched transactions.
+
+    :meth:`submit` blocks until the mission is committed and returns its
+    serialized row. The writer thread starts on first use in each process,
+    so the queue survives a fork into server workers.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.batch_size = app.config["WRITE_BEHIND_BATCH"]
+        self.max_wait = app.config["WRITE_BEHIND_WAIT_MS"] / 1000
+        self.timeout = app.config["WRITE_BEHIND_TIMEOUT"]
+        self.batches = 0
+        self.rows = 0
+        self.timeouts = 0
+        self._pid = None
+        self._start_lock = threading.Lock()
+
+    def _ensure_writer(self):
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            # A forked child inherits the queue but not the writer thread.
+            self._queue = queue.Queue()
+            self._lock = threading.Lock()
+            self._thread = threading.Thread(
+                target=self._run, name="mission-writer", daemon=True
+            )
+            self._thread.start()
+            self._pid = os.getpid()
+
+    def submit(self, values):
+        """Queue already validated mission ``values`` and wait for the commit.
+
+        Raises ``ValidationError`` if the database rejects the row and
+        :class:`QueueTimeout` if it was not picked up in time.
+        """
+        self._ensure_writer()
+        pending = _Pending(values)
+        self._queue.put(pending)
+        if not pending.done.wait(self.timeout):
+            with self._lock:
+                if not pending.taken:
+                    pending.withdrawn = True
+                    self.timeouts += 1
+                    raise QueueTimeout()
+            # Already being written: the commit is moments away.
+            pending.done.wait()
+        if pending.error is not None:
+            raise pending.error
+        return pending.result
+
+    def close(self):
+        """Write what is queued, then stop the writer thread."""
+        if self._pid != os.getpid():
+            return
+        self._queue.put(_STOP)
+        self._thread.join()
+        self._pid = None
+
+    def stats(self):
+        return {
+            "depth": self._queue.qsize() if self._pid == os.getpid() else 0,
+            "batches": self.batches,
+            "rows": self.rows,
+            "timeouts": self.timeouts,
+        }
+
+    def _take(self, pending):
+        with self._lock:
+            if pending.withdrawn:
+                return False
+            pending.taken = True
+            return True
+
+    def _next_batch(self):
+        first = self._queue.get()
+        if first is _STOP:
+            return None
+        batch = [first] if self._take(first) else []
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                pending = (
+                    self._queue.get(timeout=remaining) if remaining > 0
+                    else self._queue.get_nowait()
+                )
+            except queue.Empty:
+                break
+            if pending is _STOP:
+                self._queue.put(_STOP)
+                break
+            if self._take(pending):
+                batch.append(pending)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            if not batch:
+                continue
+            with self.app.app_context():
+                try:
+                    self._write(batch)
+                except Exception as error:
+                    db.session.rollback()
+                    for pending in batch:
+                        pending.resolve(error=error)
+                finally:
+                    db.session.remove()
+
+    def _insert(self, rows):
+        stmt = insert(Mission).returning(
+            *mission_serializer.columns, sort_by_parameter_order=True
+        )
+        written = db.session.execute(stmt, rows).all()
+        db.session.commit()
+        return written
+
+    def _write(self, batch):
+        try:
+            written = self._insert([pending.values for pending in batch])
+        except IntegrityError:
+            db.session.rollback()
+            # Find the offending rows and commit the rest one by one.
+            for pending in batch:
+                try:
+                    (row,) = self._insert([pending.values])
+                except IntegrityError:
+                    db.session.rollback()
+                    pending.resolve(error=ValidationError(["Invalid mission"]))
+                else:
+                    bump("missions")
+                    self.rows += 1
+                    pending.resolve(mission_serializer.row(row))
+            self.batches += 1
+            return
+        bump("missions")
+        self.batches += 1
+        self.rows += len(batch)
+        for pending, row in zip(batch, written):
+            pending.resolve(mission_serializer.row(row))
+
+
+def init_write_behind(app):
+    """Queue ``app``'s mission inserts for group commit if ``WRITE_BEHIND``."""
+    if app.config.get("WRITE_BEHIND"):
+        app.extensions["mission_writer"] = GroupCommitQueue(app)